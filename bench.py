@@ -0,0 +1,60 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Timing and reporting shared by the bench_*() functions.
+"""
+
+import io
+import time
+
+# Call func(*args,**kwargs) and return (result,time in seconds)
+def timed(func,*args,**kwargs):
+    t0=time.time()
+    ret=func(*args,**kwargs)
+    return (ret,time.time()-t0)
+
+# Format a time in seconds with 'digits' decimal places
+def fmt_time(dt,digits=3):
+    return ('%.'+str(digits)+'f') % dt+' s'
+
+"""
+Print 'label' followed by 'name: time' for each (name,time) pair in
+'times', and return the line
+"""
+def report(label,times,digits=3):
+    line=label+' '+', '.join(name+': '+fmt_time(dt,digits)
+                             for (name,dt) in times)
+    print(line)
+    return line
+
+"""
+Time build(), which draws a figure and returns it, and saving the
+figure to memory in each of the formats 'fmts', print the times
+after 'label' and close the figure
+"""
+def figure(label,build,fmts=('png',),digits=4):
+    import matplotlib.pyplot as plot
+    (fig,dt)=timed(build)
+    times=[('build',dt)]
+    for fmt in fmts:
+        times.append((fmt,timed(fig.savefig,io.BytesIO(),format=fmt)[1]))
+    plot.close(fig)
+    return report(label,times,digits)
@@ -0,0 +1,229 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Driver which regenerates the figures in this repository. Each
+figure's inputs (its script, the local modules it uses, its data
+files and any style parameters) are hashed, figures whose hash
+matches the last successful build and whose outputs all exist are
+skipped, and the remaining figures are rendered in parallel in a
+process pool.
+
+Usage: python build.py [-j N] [-f] [name ...]
+"""
+
+import os
+import sys
+import ast
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import tex_labels
+
+""" -------------------------------------------------------------------
+Render one figure in a worker process, either by running its script
+or, if call is given as (class name, method name), by calling that
+method of the plot class defined in the script
+"""
+def render_script(script,call=None):
+    os.environ['MPLBACKEND']='Agg'
+    import runpy
+    import matplotlib.pyplot as plot
+    t0=time.time()
+    plot.close('all')
+    if call is None:
+        runpy.run_path(script,run_name='__main__')
+    else:
+        module=runpy.run_path(script)
+        getattr(module[call[0]](),call[1])()
+    plot.close('all')
+    return time.time()-t0
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class plot_build:
+
+    # File which stores the input hash of each figure from the last
+    # successful build
+    hash_file='.build_hashes.json'
+
+    # The figures, their inputs and their outputs. The script itself
+    # is always an input, as are the local modules it imports (see
+    # local_deps()). The optional 'deps' entry lists other local
+    # modules the figure depends on, and the optional 'call' entry
+    # selects a single method of the plot class instead of running
+    # the whole script.
+    targets=[
+        {'name':'nstar_plot','script':'nstar_plot.py',
+         'inputs':[],'params':{},
+         'outputs':['nstar_plot.eps','nstar_plot.pdf','nstar_plot.svg',
+                    'nstar_plot.png']},
+        {'name':'eos_mvsr','script':'eos_mvsr.py',
+         'inputs':['eos.o2','mvsr.o2'],'params':{},
+         'outputs':['eos_mvsr.png','eos_mvsr.eps']},
+        {'name':'crust_plot','script':'crust_plot.py',
+         'deps':['load_crust.py','o2_io.py'],
+         'inputs':['inner_nn.o2','inner_nnuc.o2','outer_nnuc.o2'],
+         'params':{},'outputs':['crust_plot.png']},
+        {'name':'sfluid1','script':'sfluid.py',
+         'call':('sfluid_plot','plot1'),'inputs':[],'params':{},
+         'outputs':['sfluid1.png']},
+        {'name':'sfluid2','script':'sfluid.py',
+         'call':('sfluid_plot','plot2'),'inputs':[],'params':{},
+         'outputs':['sfluid2.png']},
+        {'name':'sfluid3','script':'sfluid.py',
+         'call':('sfluid_plot','plot3'),'inputs':[],'params':{},
+         'outputs':['sfluid3.png']}
+    ]
+
+    """
+    Return the sorted list of the .py files in the directory of
+    'script' which it imports, directly or through other local
+    modules, anywhere in the file. Imports of modules which are not
+    in that directory are ignored.
+    """
+    def local_deps(self,script):
+        base=os.path.dirname(script)
+        todo=[script]
+        found=set()
+        while len(todo)>0:
+            fname=todo.pop()
+            if not os.path.isfile(fname):
+                continue
+            with open(fname,'rb') as f:
+                try:
+                    tree=ast.parse(f.read(),fname)
+                except SyntaxError:
+                    continue
+            for node in ast.walk(tree):
+                if isinstance(node,ast.Import):
+                    mods=[a.name for a in node.names]
+                elif isinstance(node,ast.ImportFrom) and node.level==0:
+                    mods=[node.module]
+                else:
+                    continue
+                for mod in mods:
+                    dep=os.path.join(base,mod.split('.')[0]+'.py')
+                    if (dep!=script and dep not in found and
+                        os.path.isfile(dep)):
+                        found.add(dep)
+                        todo.append(dep)
+        return sorted(found)
+
+    """
+    Hash the contents of a figure's script, the local modules it
+    imports (and those in its 'deps' entry) and its input files
+    together with its style parameters and the tex_labels draft mode
+    """
+    def target_hash(self,target):
+        h=hashlib.sha256()
+        deps=set(self.local_deps(target['script']))
+        deps.update(target.get('deps',[]))
+        for fname in [target['script']]+sorted(deps)+target['inputs']:
+            h.update(fname.encode('utf-8'))
+            if os.path.isfile(fname):
+                with open(fname,'rb') as f:
+                    for block in iter(lambda: f.read(1<<20),b''):
+                        h.update(block)
+            else:
+                h.update(b'missing')
+        params=dict(target['params'],draft=tex_labels.draft_mode())
+        params=json.dumps(params,sort_keys=True)
+        h.update(params.encode('utf-8'))
+        return h.hexdigest()
+
+    # Read the hashes from the last build
+    def read_hashes(self):
+        if os.path.isfile(self.hash_file):
+            with open(self.hash_file) as f:
+                return json.load(f)
+        return {}
+
+    # Write the hashes for the current build
+    def write_hashes(self,hashes):
+        with open(self.hash_file,'w') as f:
+            json.dump(hashes,f,indent=1,sort_keys=True)
+
+    """
+    Return the targets in 'names' (or all targets if names is empty)
+    which are out of date, along with their new hashes
+    """
+    def stale(self,names=(),force=False):
+        old=self.read_hashes()
+        ret=[]
+        for target in self.targets:
+            if len(names)>0 and target['name'] not in names:
+                continue
+            digest=self.target_hash(target)
+            missing=[x for x in target['outputs'] if not os.path.isfile(x)]
+            if (force or old.get(target['name'])!=digest or
+                len(missing)>0):
+                ret.append((target,digest))
+        return ret
+
+    """
+    Render all stale targets in a process pool with n_jobs workers
+    and record the hashes of the ones which succeeded
+    """
+    def run(self,names=(),n_jobs=None,force=False):
+        t0=time.time()
+        todo=self.stale(names,force)
+        if len(todo)==0:
+            print('All figures up to date.')
+            return True
+        hashes=self.read_hashes()
+        ok=True
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures=[(target,digest,pool.submit(render_script,
+                                              target['script'],
+                                              target.get('call')))
+                     for (target,digest) in todo]
+            for (target,digest,fut) in futures:
+                try:
+                    dt=fut.result()
+                    hashes[target['name']]=digest
+                    print('Rendered',target['name'],'in',
+                          ('%.2f' % dt),'s.')
+                except Exception as e:
+                    ok=False
+                    hashes.pop(target['name'],None)
+                    print('Failed to render',target['name']+':',e)
+        self.write_hashes(hashes)
+        print('Build took',('%.2f' % (time.time()-t0)),'s.')
+        return ok
+
+""" -------------------------------------------------------------------
+Run the build
+"""
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Regenerate figures.')
+    parser.add_argument('names',nargs='*',help='figures to build')
+    parser.add_argument('-j',type=int,default=None,
+                        help='number of worker processes')
+    parser.add_argument('-f','--force',action='store_true',
+                        help='rebuild even if up to date')
+    args=parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    pb=plot_build()
+    if not pb.run(args.names,args.j,args.force):
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2015-2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+The crust figure from crust_plot.ipynb. The inner and outer crust
+panels are drawn from one template, the nuclei of each panel are one
+scatter plot, and the density labels along the top of each panel are
+computed from the data at the positions of the major ticks.
+"""
+
+import numpy
+import tex_labels
+import bench
+from load_crust import load_crust
+
+# Pyplot is not imported until the first figure is created, so that
+# importing this module is fast
+plot=None
+
+# Format a number in TeX with two significant figures
+def latex_float(f):
+    float_str="{0:.2g}".format(f)
+    if "e" in float_str:
+        base,exponent=float_str.split("e")
+        return r"${0} \times 10^{{{1}}}$".format(base,int(exponent))
+    else:
+        return float_str
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class crust_plot:
+
+    # Color for the nuclei
+    nnuc_color=(0.75,0.75,1.0)
+    # Figure object
+    fig=0
+    # The panels, from top to bottom. 'set' is the load_crust data
+    # set for the nuclei, 'neutrons' selects the neutron image, and
+    # 'text' is a list of (x,y,text,rotation) labels. The density
+    # label is placed at 'rho_pos'.
+    panels=[{'set':'nnuc','neutrons':True,'tick_fontsize':12,
+             'rho_pos':(11.05,0.95),
+             'text':[(10.83,0.5,'pasta',90),
+                     (11.32,0.5,'neutron drip',90),
+                     (11.08,0.5,'inner crust',0),
+                     (11.08,-0.18,r'$\mathrm{R~(km)}$',0)]},
+            {'set':'nnuc_outer','neutrons':False,'tick_fontsize':16,
+             'rho_pos':(11.55,0.91),
+             'text':[(11.55,0.5,'outer crust',0),
+                     (11.55,-0.18,r'$\mathrm{R~(km)}$',0)]}]
+
+    def __init__(self):
+        self.lc=load_crust()
+        self.axes=[]
+
+    # Set up the figure with one axis for each panel
+    def default_plot(self):
+        global plot
+        import matplotlib.pyplot as plot
+        import matplotlib.gridspec as gridspec
+        tex_labels.setup(plot)
+        plot.rc('font',family='serif')
+        plot.rcParams['lines.linewidth']=0.5
+        self.fig=plot.figure(figsize=(6.0,6.0))
+        self.fig.set_facecolor('white')
+        gs1=gridspec.GridSpec(len(self.panels),1)
+        self.axes=[self.fig.add_subplot(gs1[i])
+                   for i in range(0,len(self.panels))]
+        gs1.update(hspace=0.4,left=0.01,bottom=0.08,right=0.94,top=0.95)
+        for ax in self.axes:
+            ax.minorticks_on()
+            ax.tick_params('both',length=10,width=1,which='major')
+            ax.tick_params('both',length=5,width=1,which='minor')
+
+    """
+    Draw the nuclei of data set 'name' on the axes 'ax' as one
+    scatter plot. The marker sizes in points are the nuclear radii
+    Rn, as in the one plot() call per nucleus which this replaces.
+    """
+    def nuclei(self,ax,name):
+        r=self.lc.column(name,'r')
+        return ax.scatter(r,self.lc.column(name,'w'),
+                          s=numpy.asarray(self.lc.column(name,'Rn'))**2,
+                          marker='.',c=[self.nnuc_color],
+                          edgecolors=[self.nnuc_color],linewidths=1.0)
+
+    """
+    Label the mass density along the top of the axes 'ax' at each
+    major tick, all from one call to load_crust.density_at()
+    """
+    def density_labels(self,ax,fontsize):
+        (x0,x1)=ax.get_xlim()
+        ticks=[x for x in ax.get_xticks() if min(x0,x1)<=x<=max(x0,x1)]
+        for (x,rho) in zip(ticks,self.lc.density_at(ticks)):
+            ax.text(x,1.05,latex_float(rho),fontsize=fontsize,
+                    va='center',ha='center')
+
+    # Draw one panel from its entry in self.panels
+    def panel(self,ax,spec):
+        r=self.lc.column(spec['set'],'r')
+        ax.set_xlim([numpy.max(r),numpy.min(r)])
+        if spec['neutrons']:
+            self.lc.nn_image(ax)
+        self.nuclei(ax,spec['set'])
+        ax.text(spec['rho_pos'][0],spec['rho_pos'][1],
+                r'$\rho~(\mathrm{g}/\mathrm{cm}^3)$',fontsize=16,
+                va='center',ha='center',
+                bbox=dict(facecolor='white',lw=0))
+        self.density_labels(ax,spec['tick_fontsize'])
+        for (x,y,text,rot) in spec['text']:
+            ax.text(x,y,text,fontsize=16,rotation=rot,
+                    va='center',ha='center')
+        for label in ax.get_xticklabels():
+            label.set_fontsize(16)
+
+    # Main run()
+    def run(self,fname='crust_plot.png'):
+        self.lc.load()
+        self.default_plot()
+        for (ax,spec) in zip(self.axes,self.panels):
+            self.panel(ax,spec)
+        tex_labels.prepare(self.fig)
+        plot.savefig(fname)
+        plot.show()
+
+    """
+    Time drawing the nuclei of both panels with one plot() call per
+    nucleus, as the notebook did, and with nuclei(), including
+    rendering the figure
+    """
+    def bench_nuclei(self):
+        import matplotlib.pyplot as plot
+        for mode in ['plot','scatter']:
+            fig=plot.figure(figsize=(6.0,6.0))
+            def create():
+                for (i,spec) in enumerate(self.panels):
+                    ax=fig.add_subplot(len(self.panels),1,i+1)
+                    name=spec['set']
+                    if mode=='plot':
+                        r=self.lc.column(name,'r')
+                        w=self.lc.column(name,'w')
+                        Rn=self.lc.column(name,'Rn')
+                        for j in range(0,len(r)):
+                            ax.plot(r[j],w[j],marker='.',lw=0,
+                                    mfc=self.nnuc_color,
+                                    mec=self.nnuc_color,ms=Rn[j])
+                    else:
+                        self.nuclei(ax,name)
+            t_create=bench.timed(create)[1]
+            t_draw=bench.timed(fig.canvas.draw)[1]
+            plot.close(fig)
+            bench.report(mode.ljust(8),[('create',t_create),
+                                        ('draw',t_draw)])
+
+""" -------------------------------------------------------------------
+Create the plot
+"""
+
+if __name__=='__main__':
+    cp=crust_plot()
+    cp.run()
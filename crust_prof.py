@@ -0,0 +1,201 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+The crust profile of crust_plot.cpp: the crust EOS as a function of
+the radius in the star.
+
+The radius grid is the sorted radii of the TOV profile in
+crust_prof_out.o2. Each column of the crust EOS in crust_SLy4.o2 is
+interpolated in the baryon density onto the grid once, as
+add_col_from_table() does in crust_plot.cpp, and all of the columns
+are kept as one array. A query for any number of radii and columns
+finds the radii in the grid with one binary search and interpolates
+all of the columns from it. The precomputed grid is kept in a column
+cache (see o2_io) next to the profile file, and is rebuilt when
+either source file changes.
+
+Usage: python crust_prof.py
+"""
+
+import numpy
+import o2_io
+import bench
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class crust_prof:
+
+    # The TOV profile, with columns r and nb
+    prof_file='crust_prof_out.o2'
+    prof_name='crust_prof'
+    # The crust EOS, with column nb
+    crust_file='crust_SLy4.o2'
+    crust_name='feq'
+    # Version of the precomputed grid, which is part of the cache stamp
+    version=1
+
+    def __init__(self):
+        # The sorted radii of the grid, the column names, their units,
+        # and the columns on the grid, one row per column
+        self.r=numpy.zeros(0)
+        self.names=[]
+        self.units={}
+        self.values=numpy.zeros((0,0))
+        # The row of self.values for each column
+        self.rows={}
+
+    # Return the name of the cache file for the precomputed grid
+    def cache_file(self):
+        return o2_io.cache_name(self.prof_file,'profile')
+
+    """
+    Return the stamp of the precomputed grid, from the stamps of the
+    two source files
+    """
+    def stamp(self):
+        return [o2_io.default_index.file_stamp(self.prof_file),
+                o2_io.default_index.file_stamp(self.crust_file),
+                self.version]
+
+    """
+    Compute the columns on the radius grid and return a list of
+    (name,array) pairs, starting with r, and a dictionary of units.
+    The columns of the profile are used as they are, the other
+    columns of the crust EOS are interpolated in nb, and A=N+Z and
+    ntotal=nn+nnuc are added. As in crust_plot.cpp, neutron densities
+    below 1e-12 are set to zero.
+    """
+    def build(self):
+        prof=o2_io.h5read_type_named(self.prof_file,'table',
+                                     self.prof_name)
+        prof_cols=o2_io.read_string_array(prof['col_names'])
+        data=o2_io.read_columns(prof,prof_cols)
+        units=o2_io.table_units(prof)
+        order=numpy.unique(data['r'],return_index=True)[1]
+        data=dict((k,v[order]) for (k,v) in data.items())
+        crust=o2_io.h5read_type_named(self.crust_file,'table',
+                                      self.crust_name)
+        crust_cols=o2_io.read_string_array(crust['col_names'])
+        crust_data=o2_io.read_columns(crust,crust_cols)
+        crust_units=o2_io.table_units(crust)
+        for col in crust_cols:
+            if col not in data:
+                data[col]=numpy.interp(data['nb'],crust_data['nb'],
+                                       crust_data[col])
+                if col in crust_units:
+                    units[col]=crust_units[col]
+        nn=data['nn']
+        nn[(nn>0.0)&(nn<1.0e-12)]=0.0
+        data['A']=data['N']+data['Z']
+        data['ntotal']=data['nn']+data['nnuc']
+        units['ntotal']=units.get('nn','1/fm^3')
+        names=['r']+[c for c in prof_cols if c!='r']
+        names+=[c for c in crust_cols if c not in names]+['A','ntotal']
+        return ([(c,data[c]) for c in names],units)
+
+    """
+    Load the grid from the cache, building the cache first if it is
+    missing or older than either source file
+    """
+    def load(self):
+        cname=self.cache_file()
+        stamp=self.stamp()
+        (header,data)=o2_io.read_cache(cname)
+        if header is None or header['stamp']!=stamp:
+            (columns,units)=self.build()
+            try:
+                o2_io.write_cache_columns(cname,stamp,units,columns)
+            except IOError:
+                self.set_columns(columns,units)
+                return
+            (header,data)=o2_io.read_cache(cname)
+        self.set_columns([(c[0],data[c[0]]) for c in header['columns']],
+                         header['units'])
+
+    # Set the grid from the list of columns given by build()
+    def set_columns(self,columns,units):
+        self.r=columns[0][1]
+        self.names=[c for (c,arr) in columns[1:]]
+        self.units=units
+        self.values=numpy.array([arr for (c,arr) in columns[1:]])
+        self.rows=dict((c,i) for (i,c) in enumerate(self.names))
+
+    """
+    Return a dictionary of the columns 'cols' (all columns if None),
+    linearly interpolated at the radii r, which may be a number or
+    an array. Radii outside the grid get the value at the nearest
+    end of the grid, as with numpy.interp().
+    """
+    def query(self,r,cols=None):
+        if len(self.r)==0:
+            self.load()
+        if cols is None:
+            cols=self.names
+        r=numpy.asarray(r,dtype='f8')
+        i=numpy.clip(numpy.searchsorted(self.r,r,side='right')-1,0,
+                     len(self.r)-2)
+        frac=numpy.clip((r-self.r[i])/(self.r[i+1]-self.r[i]),0.0,1.0)
+        v=self.values[[self.rows[c] for c in cols]]
+        res=v[:,i]+frac*(v[:,i+1]-v[:,i])
+        return dict(zip(cols,res))
+
+    """
+    Return the range of radii of the grid points with baryon
+    densities from nb_low to nb_high
+    """
+    def r_range(self,nb_low,nb_high):
+        if len(self.r)==0:
+            self.load()
+        nb=self.values[self.rows['nb']]
+        keep=(nb>=nb_low)&(nb<=nb_high)
+        return (numpy.min(self.r[keep]),numpy.max(self.r[keep]))
+
+    """
+    Time the interpolation of the columns used by crust_plot.cpp at
+    n radii with one numpy.interp() call per column and with one
+    query(), and time loading the grid with and without the cache
+    """
+    def bench_query(self,n=1000000):
+        cols=['nnuc','nn','N','Z','Rn','nb','ne']
+        t_build=bench.timed(self.build)[1]
+        t_load=bench.timed(self.load)[1]
+        bench.report('Grid:',[('build',t_build),('load from cache',t_load)],
+                     4)
+        rng=numpy.random.default_rng(0)
+        r=rng.uniform(self.r[0],self.r[-1],n)
+        def interp():
+            return dict((c,numpy.interp(r,self.r,self.values[self.rows[c]]))
+                        for c in cols)
+        (res1,t_interp)=bench.timed(interp)
+        (res2,t_query)=bench.timed(self.query,r,cols)
+        err=max(numpy.max(numpy.abs(res1[c]-res2[c])) for c in cols)
+        bench.report(str(len(cols))+' columns at '+str(n)+' radii'+
+                     ' (max. difference '+('%.1e' % err)+'):',
+                     [('numpy.interp',t_interp),('query',t_query)])
+
+""" -------------------------------------------------------------------
+Time the profile
+"""
+
+if __name__=='__main__':
+    cp=crust_prof()
+    cp.bench_query()
@@ -0,0 +1,206 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+The sampling of crust particles in main() of crust_plot.cpp.
+
+The total density of neutrons and nuclei in the crust profile of
+crust_prof.py is histogrammed in n_bins bins in r, and radii are
+drawn from the histogram by inverting its cumulative distribution,
+which is linear in each bin. Each particle is a neutron with probability
+nn/(nn+nnuc) at its radius and is otherwise a nucleus. The particles
+are drawn in chunks of chunk_size, with one vectorized pass for each
+chunk, and each chunk is appended to the output tables, so the
+memory used does not depend on the number of particles.
+
+The nuclei can then be relaxed with mini_md.py or md_chains.py.
+
+Usage: python crust_sample.py [inner|outer] [n_samples]
+"""
+
+import sys
+import numpy
+import o2_io
+import crust_prof
+import bench
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class crust_sample:
+
+    # Number of bins in r
+    n_bins=500
+    # Number of rows drawn in each chunk
+    chunk_size=1000000
+    # Seed for the random number generator
+    seed=0
+    # Baryon density range (in 1/fm^3) of the inner crust, from the
+    # neutron drip density to the crust-core transition. The outer
+    # crust is below the inner crust down to nb_outer.
+    nb_drip=0.16*4.0e11/2.8e14
+    nb_core=0.08
+    nb_outer=1.0e-8
+
+    def __init__(self):
+        # The crust profile and the range of radii which is sampled
+        self.prof=crust_prof.crust_prof()
+        self.r_low=0.0
+        self.r_high=0.0
+        # Bin edges and the cumulative distribution at the edges,
+        # from histogram()
+        self.edges=numpy.zeros(0)
+        self.cdf=numpy.zeros(0)
+
+    # Sample the radii of the profile with nb_low<=nb<=nb_high
+    def set_range(self,nb_low,nb_high):
+        (self.r_low,self.r_high)=self.prof.r_range(nb_low,nb_high)
+
+    """
+    Histogram the total density nn+nnuc at the centers of n_bins bins
+    which span the profile, and compute its cumulative distribution
+    """
+    def histogram(self):
+        self.edges=numpy.linspace(self.r_low,self.r_high,self.n_bins+1)
+        rep=0.5*(self.edges[1:]+self.edges[:-1])
+        h=self.prof.query(rep,['ntotal'])['ntotal']
+        self.cdf=numpy.concatenate(([0.0],numpy.cumsum(h)))
+        self.cdf/=self.cdf[-1]
+
+    """
+    Draw n radii from the histogram with the random numbers u,
+    inverting the cumulative distribution, which is linear in each bin
+    """
+    def radii(self,u):
+        i=numpy.searchsorted(self.cdf,u,side='right')-1
+        i=numpy.clip(i,0,self.n_bins-1)
+        frac=(u-self.cdf[i])/(self.cdf[i+1]-self.cdf[i])
+        return self.edges[i]+frac*(self.edges[i+1]-self.edges[i])
+
+    """
+    Draw n particles and return (r,w,neutron), where neutron is True
+    for the neutrons
+    """
+    def sample(self,rng,n):
+        r=self.radii(rng.random(n))
+        q=self.prof.query(r,['nn','nnuc'])
+        neutron=rng.random(n)*(q['nn']+q['nnuc'])<q['nn']
+        w=rng.random(n)
+        return (r,w,neutron)
+
+    """
+    Draw n_samples particles from the profile between nb_low and
+    nb_high and write the neutrons to table nn_name of file nn_fname
+    (unless nn_fname is None) and the nuclei, with A, Rn and nb, to
+    table nnuc_name of file nnuc_fname. Returns the number of
+    neutrons and of nuclei. As in crust_plot.cpp, the first particle
+    is always a nucleus, and if first_at_edge is True it is placed at
+    the largest radius.
+    """
+    def run(self,nb_low,nb_high,n_samples,nn_fname,nn_name,nnuc_fname,
+            nnuc_name,first_at_edge=False):
+        self.set_range(nb_low,nb_high)
+        self.histogram()
+        rng=numpy.random.default_rng(self.seed)
+        nuc_cols=['r','w','A','Rn','nb']
+        if nn_fname is not None:
+            o2_io.write_table(nn_fname,nn_name,[('r',numpy.zeros(0)),
+                                                ('w',numpy.zeros(0))])
+        o2_io.write_table(nnuc_fname,nnuc_name,
+                          [(c,numpy.zeros(0)) for c in nuc_cols],
+                          {'r':'km','Rn':'fm','nb':'1/fm^3'})
+        n_nn=0
+        n_nnuc=0
+        for start in range(0,n_samples,self.chunk_size):
+            (r,w,neutron)=self.sample(rng,min(self.chunk_size,
+                                              n_samples-start))
+            if start==0:
+                neutron[0]=False
+                if first_at_edge:
+                    r[0]=self.r_high
+            if nn_fname is not None:
+                o2_io.append_table(nn_fname,nn_name,[('r',r[neutron]),
+                                                     ('w',w[neutron])])
+            rn=r[~neutron]
+            q=self.prof.query(rn,['A','Rn','nb'])
+            o2_io.append_table(nnuc_fname,nnuc_name,
+                               [('r',rn),('w',w[~neutron]),('A',q['A']),
+                                ('Rn',q['Rn']),('nb',q['nb'])])
+            n_nn+=numpy.sum(neutron)
+            n_nnuc+=len(rn)
+        print(str(n_nn)+' neutrons and '+str(n_nnuc)+' nuclei.')
+        return (n_nn,n_nnuc)
+
+    # Sample the inner crust, as crust_plot.cpp does with inner=true
+    def inner(self,n_samples=600000):
+        return self.run(self.nb_drip,self.nb_core,n_samples,
+                        'inner_nn.o2','inner_nn','inner_nnuc.o2',
+                        'inner_nnuc')
+
+    """
+    Sample the outer crust, as crust_plot.cpp does with inner=false.
+    The neutrons are not written, and the first nucleus is placed at
+    the largest radius.
+    """
+    def outer(self,n_samples=1200):
+        return self.run(self.nb_outer,self.nb_drip,n_samples,None,None,
+                        'outer_nnuc.o2','outer_nnuc',True)
+
+    """
+    Time sample() for n particles, compared with drawing a radius
+    from the histogram and interpolating nn and nnuc separately for
+    each particle, as crust_plot.cpp does, for the first n_slow
+    particles. The per particle time is scaled to n particles.
+    """
+    def bench_sample(self,n=1000000,n_slow=20000):
+        self.set_range(self.nb_drip,self.nb_core)
+        self.histogram()
+        rng=numpy.random.default_rng(self.seed)
+        def per_particle():
+            for i in range(0,n_slow):
+                r=self.radii(rng.random())
+                nn=self.prof.query(r,['nn'])['nn']
+                nnuc=self.prof.query(r,['nnuc'])['nnuc']
+                neutron=(rng.random()<nn/(nn+nnuc))
+                w=rng.random()
+        dt=bench.timed(per_particle)[1]*float(n)/n_slow
+        bench.report(str(n)+' particles:',
+                     [('per particle (estimated from '+str(n_slow)+')',dt),
+                      ('vectorized',bench.timed(self.sample,rng,n)[1])])
+
+""" -------------------------------------------------------------------
+Sample the crust
+"""
+
+if __name__=='__main__':
+    cs=crust_sample()
+    crust='inner'
+    if len(sys.argv)>1:
+        crust=sys.argv[1]
+    if crust=='inner':
+        if len(sys.argv)>2:
+            cs.inner(int(sys.argv[2]))
+        else:
+            cs.inner()
+    else:
+        if len(sys.argv)>2:
+            cs.outer(int(sys.argv[2]))
+        else:
+            cs.outer()
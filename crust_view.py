@@ -0,0 +1,230 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Interactive view of the crust particles with level of detail.
+
+The (r,w) positions are sorted into the cells of a uniform grid, and
+each time the axis limits change only the points in the cells which
+overlap the view are drawn. If there are more than max_points of
+them, the same fraction of the points in each cell is drawn. The
+points in each cell are in random order, so this is a uniform random
+sample, and zooming in shows more of the points until all of the
+points in view are drawn.
+
+Usage: python crust_view.py
+"""
+
+import numpy
+import bench
+from load_crust import load_crust
+
+""" -------------------------------------------------------------------
+Spatial index
+"""
+class grid_index:
+
+    """
+    Index the points (x,y) on a grid of nx by ny cells. Any extra
+    arrays in 'data' (e.g. marker sizes) are reordered with the
+    points.
+    """
+    def __init__(self,x,y,nx=256,ny=256,data=None,seed=0):
+        x=numpy.asarray(x)
+        y=numpy.asarray(y)
+        self.nx=nx
+        self.ny=ny
+        self.x_range=(numpy.min(x),numpy.max(x))
+        self.y_range=(numpy.min(y),numpy.max(y))
+        cell=self.cell_of(x,y)
+        # Shuffle, then sort by cell, so that each cell is in random
+        # order
+        rng=numpy.random.default_rng(seed)
+        perm=rng.permutation(len(x))
+        order=perm[numpy.argsort(cell[perm],kind='stable')]
+        self.x=x[order]
+        self.y=y[order]
+        if data is None:
+            data={}
+        self.data=dict((k,numpy.asarray(v)[order]) for (k,v) in
+                       data.items())
+        # The points in cell c are start[c] to start[c+1]-1
+        self.start=numpy.concatenate(([0],numpy.cumsum(
+            numpy.bincount(cell,minlength=nx*ny))))
+
+    # Return the column and row of the cells containing x and y
+    def col_row(self,x,y):
+        ix=((x-self.x_range[0])/(self.x_range[1]-self.x_range[0])*
+            self.nx).astype(int)
+        iy=((y-self.y_range[0])/(self.y_range[1]-self.y_range[0])*
+            self.ny).astype(int)
+        return (numpy.clip(ix,0,self.nx-1),numpy.clip(iy,0,self.ny-1))
+
+    # Return the index of the cell containing each point
+    def cell_of(self,x,y):
+        (ix,iy)=self.col_row(x,y)
+        return iy*self.nx+ix
+
+    """
+    Return the indices (into self.x, self.y and self.data) of the
+    points with x0<=x<=x1 and y0<=y<=y1, taking the same fraction of
+    the points in each cell if there are more than max_points
+    """
+    def query(self,x0,x1,y0,y1,max_points=20000):
+        (ix0,iy0)=self.col_row(numpy.array(min(x0,x1)),
+                               numpy.array(min(y0,y1)))
+        (ix1,iy1)=self.col_row(numpy.array(max(x0,x1)),
+                               numpy.array(max(y0,y1)))
+        cols=numpy.arange(ix0,ix1+1)
+        rows=numpy.arange(iy0,iy1+1)
+        cells=(rows[:,None]*self.nx+cols[None,:]).ravel()
+        first=self.start[cells]
+        count=self.start[cells+1]-first
+        total=numpy.sum(count)
+        if total>max_points:
+            # Round the cumulative sum, so that the total is exactly
+            # max_points
+            cum=numpy.floor(numpy.cumsum(count)*(max_points/total))
+            take=numpy.diff(numpy.concatenate(([0],cum))).astype(int)
+        else:
+            take=count
+        # The first take[i] points of each cell
+        offsets=numpy.cumsum(take)-take
+        idx=(numpy.repeat(first-offsets,take)+
+             numpy.arange(numpy.sum(take)))
+        x=self.x[idx]
+        y=self.y[idx]
+        keep=((x>=min(x0,x1))&(x<=max(x0,x1))&
+              (y>=min(y0,y1))&(y<=max(y0,y1)))
+        return idx[keep]
+
+""" -------------------------------------------------------------------
+Level of detail scatter plot
+"""
+class lod_scatter:
+
+    """
+    Draw the points (x,y) on the axes 'ax' as one scatter plot which
+    is updated from a grid_index when the axis limits change. If
+    sizes is given, it is the marker size of each point in points.
+    The remaining keyword arguments are passed to ax.scatter().
+    """
+    def __init__(self,ax,x,y,sizes=None,max_points=20000,nx=256,ny=256,
+                 **kwargs):
+        data={}
+        if sizes is not None:
+            data['s']=numpy.asarray(sizes)**2
+        self.index=grid_index(x,y,nx,ny,data)
+        self.ax=ax
+        self.max_points=max_points
+        self.artist=ax.scatter(self.index.x[0:0],self.index.y[0:0],
+                               **kwargs)
+        self.update(ax)
+        ax.callbacks.connect('xlim_changed',self.update)
+        ax.callbacks.connect('ylim_changed',self.update)
+
+    # Show the points in the current view
+    def update(self,ax):
+        (x0,x1)=ax.get_xlim()
+        (y0,y1)=ax.get_ylim()
+        idx=self.index.query(x0,x1,y0,y1,self.max_points)
+        self.artist.set_offsets(numpy.column_stack((self.index.x[idx],
+                                                    self.index.y[idx])))
+        if 's' in self.index.data:
+            self.artist.set_sizes(self.index.data['s'][idx])
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class crust_view:
+
+    # Number of neutrons and of nuclei drawn in each view
+    max_neutrons=20000
+    max_nuclei=5000
+    # Marker colors, as in the crust notebook
+    nn_color=(0.9,0.9,1.0)
+    nnuc_color=(0.75,0.75,1.0)
+
+    # Create the figure for the inner and outer crust
+    def run(self):
+        import matplotlib.pyplot as plot
+        lc=load_crust()
+        lc.load()
+        (self.fig,(self.ax1,self.ax2))=plot.subplots(2,1,figsize=(8,8))
+        self.ax1.set_xlim([numpy.max(lc.r_nnuc),numpy.min(lc.r_nnuc)])
+        self.ax1.set_ylim([0,1])
+        self.ax2.set_xlim([numpy.max(lc.r_nnuc_outer),
+                           numpy.min(lc.r_nnuc_outer)])
+        self.ax2.set_ylim([0,1])
+        self.layers=[lod_scatter(self.ax1,lc.r_nn,lc.w_nn,
+                                 max_points=self.max_neutrons,
+                                 color=self.nn_color,s=4.0,lw=0,
+                                 zorder=1),
+                     lod_scatter(self.ax1,lc.r_nnuc,lc.w_nnuc,
+                                 lc.Rn_nnuc,self.max_nuclei,
+                                 color=self.nnuc_color,lw=0,zorder=2),
+                     lod_scatter(self.ax2,lc.r_nnuc_outer,
+                                 lc.w_nnuc_outer,lc.Rn_nnuc_outer,
+                                 self.max_nuclei,color=self.nnuc_color,
+                                 lw=0,zorder=2)]
+        plot.show()
+
+"""
+Time indexing n random points, querying views of decreasing size
+and redrawing the figure after each zoom, compared with drawing all
+of the points in one scatter plot
+"""
+def bench_lod(n=2000000,max_points=20000):
+    import matplotlib.pyplot as plot
+    rng=numpy.random.default_rng(0)
+    x=rng.uniform(10.8,11.35,n)
+    y=rng.uniform(0.0,1.0,n)
+    fig=plot.figure()
+    ax=fig.add_subplot(1,1,1)
+    def draw_all():
+        ax.scatter(x,y,s=4.0,lw=0)
+        fig.canvas.draw()
+    bench.report('All points:',[('draw',bench.timed(draw_all)[1])])
+    plot.close(fig)
+    fig=plot.figure()
+    ax=fig.add_subplot(1,1,1)
+    ax.set_xlim([10.8,11.35])
+    ax.set_ylim([0.0,1.0])
+    (ls,dt)=bench.timed(lod_scatter,ax,x,y,max_points=max_points,s=4.0,
+                        lw=0)
+    bench.report('Index:',[('build',dt)])
+    for zoom in [1,10,100,1000]:
+        def zoom_in():
+            ax.set_xlim([11.0,11.0+0.55/zoom])
+            ax.set_ylim([0.5,0.5+1.0/zoom])
+        t_query=bench.timed(zoom_in)[1]
+        t_draw=bench.timed(fig.canvas.draw)[1]
+        bench.report('Zoom '+str(zoom).rjust(4)+', '+
+                     str(len(ls.artist.get_offsets())).rjust(6)+' points:',
+                     [('query',t_query),('draw',t_draw)],4)
+    plot.close(fig)
+
+""" -------------------------------------------------------------------
+Show the crust
+"""
+
+if __name__=='__main__':
+    cv=crust_view()
+    cv.run()
@@ -21,20 +21,16 @@ along with this neutron star plot. If not, see
 
 """
 
-import h5py
-from matplotlib.patches import Rectangle
-import matplotlib.pyplot as plot
-
-list_of_dsets=[]
-
-# H5py read function from O2scl
-def hdf5_is_object_type(name,obj):
-    if isinstance(obj,h5py.Group):
-        if 'o2scl_type' in obj.keys():
-            o2scl_type_dset=obj['o2scl_type']
-            if o2scl_type_dset.__getitem__(0) == search_type:
-                list_of_dsets.append(name)
-                
+import os
+import numpy
+import o2_io
+import tex_labels
+import bench
+
+# Pyplot is not imported until the first figure is created, so that
+# importing this module is fast
+plot=None
+
 """ -------------------------------------------------------------------
 Class definition
 """
@@ -45,7 +41,9 @@ class eos_mvsr_plot:
 
     # Default plot function from O2scl
     def default_plot(self,lmar=0.14,bmar=0.12,rmar=0.04,tmar=0.04):
-        plot.rc('text',usetex=True)
+        global plot
+        import matplotlib.pyplot as plot
+        tex_labels.setup(plot)
         plot.rc('font',family='serif')
         plot.rcParams['lines.linewidth']=0.5
         self.fig,(self.ax1,self.ax2) = plot.subplots(1,2,figsize=(10.0,6.0))
@@ -60,32 +58,18 @@ class eos_mvsr_plot:
         self.fig.set_facecolor('white')
         plot.grid(False)
 
-    # H5py read function from O2scl
+    """
+    H5py read function from O2scl, using the cached object index
+    from o2_io
+    """
     def h5read_type_named(self,fname,loc_type,name):
-        del list_of_dsets[:]
-        global search_type
-        search_type=loc_type
-        file=h5py.File(fname,'r')
-        file.visititems(hdf5_is_object_type)
-        if name in list_of_dsets:
-            return file[name]
-            str=('No object of type '+loc_type+' named '+name+
-                 ' in file '+fname+'.')
-            raise RuntimeError(str)
-            return
+        return o2_io.h5read_type_named(fname,loc_type,name)
 
-    # Main run()
-    def run(self):
-        self.default_plot()
-        dset=self.h5read_type_named('eos.o2','table','full_eos')
-        # Convert to MeV/fm^3
-        ed2=[dset['data/ed'][i]*197.33 for i in 
-             range(0,len(dset['data/ed']))]
-        pr2=[dset['data/pr'][i]*197.33 for i in 
-             range(0,len(dset['data/pr']))]
+    # Set the axis limits and add the labels to both panels
+    def decorate(self):
+        self.ax1.set_yscale('log')
         self.ax1.set_ylim([1.0e-1,1.0e3])
         self.ax1.set_xlim([0,1600])
-        self.ax1.semilogy(ed2,pr2)
         self.ax1.text(0.5,-0.08,
                       r'$\varepsilon~(\mathrm{MeV}/\mathrm{fm}^3)$',
                       fontsize=24,va='center',ha='center',
@@ -94,10 +78,8 @@ class eos_mvsr_plot:
                       r'$P~(\mathrm{MeV}/\mathrm{fm}^3)$',
                       fontsize=24,va='center',ha='center',
                       transform=self.ax1.transAxes,rotation=90)
-        dset=self.h5read_type_named('mvsr.o2','table','mvsr')
         self.ax2.set_ylim([0.0,2.1])
         self.ax2.set_xlim([8,24])
-        self.ax2.plot(dset['data/r'],dset['data/gm'])
         self.ax2.text(0.5,-0.08,'$R~(\mathrm{km})$',
                       fontsize=24,va='center',ha='center',
                       transform=self.ax2.transAxes)
@@ -116,13 +98,240 @@ class eos_mvsr_plot:
                       fontsize=28,va='center',ha='center',
                       transform=self.ax1.transAxes,zorder=10,
                       bbox=dict(facecolor=(0.75,0.75,1.0),lw=0))
-        plot.savefig('eos_mvsr.png')
-        plot.savefig('eos_mvsr.eps')
+
+    # Save the figure in the formats used by run()
+    def save(self,basename='eos_mvsr'):
+        tex_labels.prepare(self.fig)
+        plot.savefig(basename+'.png')
+        plot.savefig(basename+'.eps')
+
+    # Main run()
+    def run(self):
+        self.default_plot()
+        # Convert to MeV/fm^3
+        conv=('1/fm^4','MeV/fm^3')
+        eos=o2_io.load_table('eos.o2','full_eos',['ed','pr'],
+                             {'ed':conv,'pr':conv})
+        self.ax1.semilogy(eos['ed'],eos['pr'])
+        mvsr=o2_io.load_table('mvsr.o2','mvsr',['r','gm'])
+        self.ax2.plot(mvsr['r'],mvsr['gm'])
+        self.decorate()
+        self.save()
         plot.show()
 
+    """
+    Iterate over an ensemble of EOSs stored in the files 'fnames'.
+    Each table whose name, without its group, starts with eos_prefix
+    is an EOS, and is paired with the table in the same group with
+    the same suffix after mvsr_prefix, if there is one. Yields
+    (ed,pr,r,gm) with ed and pr in MeV/fm^3, and with r and gm None
+    for an EOS without an M-R curve.
+    """
+    def ensemble_curves(self,fnames,eos_prefix='full_eos',
+                        mvsr_prefix='mvsr'):
+        conv=('1/fm^4','MeV/fm^3')
+        for fname in fnames:
+            f=o2_io.default_index.open(fname)
+            tables=o2_io.default_index.names_of_type(fname,'table')
+            for name in tables:
+                base=name.split('/')[-1]
+                if not base.startswith(eos_prefix):
+                    continue
+                eos=o2_io.read_columns(f[name],['ed','pr'],
+                                       {'ed':conv,'pr':conv})
+                mname=(name[:len(name)-len(base)]+mvsr_prefix+
+                       base[len(eos_prefix):])
+                if mname in tables:
+                    mvsr=o2_io.read_columns(f[mname],['r','gm'])
+                    yield (eos['ed'],eos['pr'],mvsr['r'],mvsr['gm'])
+                else:
+                    yield (eos['ed'],eos['pr'],None,None)
+
+    """
+    Plot an ensemble of EOSs and M-R curves from the files 'fnames'
+    (see ensemble_curves()) in one pass over the data.
+
+    With mode='lines', every curve is drawn, with one LineCollection
+    per panel. With mode='density' or mode='bands', the curves are
+    instead accumulated in a curve_hist for each panel, so that the
+    memory used does not depend on the size of the ensemble, and are
+    shown as a density image or as quantile bands. The M-R bands are
+    quantiles of the radius at fixed mass. If basename is None the
+    figure is not saved.
+    """
+    def ensemble(self,fnames,mode='bands',basename='eos_mvsr_ensemble',
+                 quantiles=((0.05,0.95),(0.16,0.84)),alpha=0.05,
+                 eos_prefix='full_eos',mvsr_prefix='mvsr'):
+        from matplotlib.collections import LineCollection
+        self.default_plot()
+        eos_hist=curve_hist(0.0,1600.0,200,1.0e-1,1.0e3,200,log_y=True)
+        mvsr_hist=curve_hist(0.0,2.1,105,8.0,24.0,160)
+        eos_lines=[]
+        mvsr_lines=[]
+        for (ed,pr,r,gm) in self.ensemble_curves(fnames,eos_prefix,
+                                                 mvsr_prefix):
+            if mode=='lines':
+                eos_lines.append(numpy.column_stack((ed,pr)))
+                if r is not None:
+                    mvsr_lines.append(numpy.column_stack((r,gm)))
+            else:
+                eos_hist.add(ed,pr)
+                if r is not None:
+                    # Only the stable branch, up to the maximum mass
+                    imax=numpy.argmax(gm)
+                    mvsr_hist.add(gm[0:imax+1],r[0:imax+1])
+        if mode=='lines':
+            self.ax1.add_collection(LineCollection(eos_lines,alpha=alpha,
+                                                   color='blue'))
+            self.ax2.add_collection(LineCollection(mvsr_lines,alpha=alpha,
+                                                   color='blue'))
+        elif mode=='density':
+            self.ax1.set_yscale('log')
+            self.ax1.pcolormesh(eos_hist.x_edges,eos_hist.y_edges,
+                                eos_hist.density().T,cmap='Blues')
+            self.ax2.pcolormesh(mvsr_hist.y_edges,mvsr_hist.x_edges,
+                                mvsr_hist.density(),cmap='Blues')
+        else:
+            for (ix,q) in enumerate(quantiles):
+                (lo,hi)=eos_hist.quantiles(q)
+                self.ax1.fill_between(eos_hist.x,lo,hi,color='blue',
+                                      alpha=0.25*(ix+1),lw=0)
+                (lo,hi)=mvsr_hist.quantiles(q)
+                self.ax2.fill_betweenx(mvsr_hist.x,lo,hi,color='blue',
+                                       alpha=0.25*(ix+1),lw=0)
+        self.decorate()
+        if basename is not None:
+            self.save(basename)
+
+    """
+    Check that ensemble_curves() finds EOS tables in groups, as
+    mass_limits.read_eos() does, and pairs each with the M-R curve in
+    its own group, using tables written to fname
+    """
+    def check_nested(self,fname='check_nested.o2'):
+        if os.path.isfile(fname):
+            os.remove(fname)
+        ed=numpy.linspace(0.1,10.0,10)
+        for (i,group) in enumerate(['','a/','a/b/','c/']):
+            o2_io.write_table(fname,group+'full_eos_'+str(i),
+                              [('ed',ed),('pr',ed*(i+1))])
+            if group!='c/':
+                o2_io.write_table(fname,group+'mvsr_'+str(i),
+                                  [('r',ed+i),('gm',ed)])
+        # A curve whose suffix matches an EOS in another group
+        o2_io.write_table(fname,'c/x/mvsr_3',[('r',ed),('gm',ed)])
+        found=[]
+        for (e,p,r,gm) in self.ensemble_curves([fname]):
+            i=int(round(p[0]/e[0]))-1
+            found.append((i,None if r is None else int(round(r[0]-ed[0]))))
+        o2_io.default_index.close(fname)
+        os.remove(fname)
+        if os.path.isfile(fname+str(o2_io.default_index.sidecar_suffix)):
+            os.remove(fname+o2_io.default_index.sidecar_suffix)
+        if sorted(found)!=[(0,0),(1,1),(2,2),(3,None)]:
+            raise RuntimeError('Nested tables paired as '+str(found)+'.')
+
+    """
+    Time ensemble() for ensembles of each size in 'sizes', using
+    synthetic polytropic EOSs and M-R curves written to fname, to
+    check that the time scales linearly with the ensemble size. The
+    figure is not saved, so only reading and drawing are timed.
+    """
+    def bench_ensemble(self,sizes=(100,300,1000),mode='bands',
+                       fname='bench_ensemble.o2'):
+        rng=numpy.random.default_rng(0)
+        for n in sizes:
+            if os.path.isfile(fname):
+                os.remove(fname)
+            ed=numpy.linspace(0.1,10.0,400)
+            m=numpy.linspace(0.1,1.0,100)
+            for i in range(0,n):
+                gam=rng.uniform(1.8,2.6)
+                r0=rng.uniform(10.5,14.0)
+                mmax=rng.uniform(1.8,2.6)
+                o2_io.write_table(fname,'full_eos_'+str(i),
+                                  [('ed',ed),('pr',0.3*ed**gam)])
+                o2_io.write_table(fname,'mvsr_'+str(i),
+                                  [('r',r0+1.5*m-2.5*m**4),
+                                   ('gm',mmax*numpy.sin(m*numpy.pi/2))])
+            dt=bench.timed(self.ensemble,[fname],mode,None)[1]
+            plot.close('all')
+            bench.report(str(n).rjust(6)+' EOSs:',[('total',dt),
+                                                  ('per EOS',dt/n)],5)
+        o2_io.default_index.close(fname)
+        os.remove(fname)
+
+""" -------------------------------------------------------------------
+Histogram of an ensemble of curves
+"""
+class curve_hist:
+
+    """
+    Set up a histogram with nx columns between x_min and x_max and ny
+    bins in y between y_min and y_max, logarithmic if log_y is True
+    """
+    def __init__(self,x_min,x_max,nx,y_min,y_max,ny,log_y=False):
+        self.log_y=log_y
+        self.x_edges=numpy.linspace(x_min,x_max,nx+1)
+        # The curves are sampled at the centers of the columns
+        self.x=(self.x_edges[1:]+self.x_edges[:-1])/2.0
+        if log_y:
+            self.y_edges=numpy.logspace(numpy.log10(y_min),
+                                        numpy.log10(y_max),ny+1)
+        else:
+            self.y_edges=numpy.linspace(y_min,y_max,ny+1)
+        # Counts in each bin, with an extra bin at each end for the
+        # values below y_min and above y_max
+        self.counts=numpy.zeros((nx,ny+2))
+        self.n_curves=0
+
+    # Add one curve, ignoring columns outside of the range of x
+    def add(self,x,y):
+        order=numpy.argsort(x)
+        x=x[order]
+        y=y[order]
+        if self.log_y:
+            yi=numpy.exp(numpy.interp(self.x,x,numpy.log(y),
+                                      left=numpy.nan,right=numpy.nan))
+        else:
+            yi=numpy.interp(self.x,x,y,left=numpy.nan,right=numpy.nan)
+        ix=numpy.nonzero(numpy.isfinite(yi))[0]
+        iy=numpy.searchsorted(self.y_edges,yi[ix],side='right')
+        iy=numpy.minimum(iy,len(self.y_edges))
+        self.counts[ix,iy]+=1.0
+        self.n_curves+=1
+
+    """
+    The fraction of the curves in each column which lie in each bin,
+    with shape (nx,ny)
+    """
+    def density(self):
+        tot=numpy.sum(self.counts,axis=1,keepdims=True)
+        return self.counts[:,1:-1]/numpy.where(tot>0,tot,1.0)
+
+    """
+    Return arrays of the y values at the quantiles 'q' in each
+    column, interpolating within bins. The value is NaN for empty
+    columns and where the quantile lies outside of the y range.
+    """
+    def quantiles(self,q):
+        tot=numpy.sum(self.counts,axis=1,keepdims=True)
+        # The fraction of the curves below each bin edge
+        cdf=numpy.cumsum(self.counts,axis=1)[:,:-1]/numpy.where(tot>0,
+                                                                tot,1.0)
+        ret=[]
+        for qi in q:
+            yq=numpy.full(len(self.x),numpy.nan)
+            for i in numpy.nonzero(tot[:,0]>0)[0]:
+                yq[i]=numpy.interp(qi,cdf[i],self.y_edges,
+                                   left=numpy.nan,right=numpy.nan)
+            ret.append(yq)
+        return ret
+
 """ -------------------------------------------------------------------
 Create the plot
 """
 
-em=eos_mvsr_plot()
-em.run()
+if __name__=='__main__':
+    em=eos_mvsr_plot()
+    em.run()
@@ -19,114 +19,216 @@ along with this neutron star plot. If not, see
 
 -------------------------------------------------------------------
 
+Crust data for the crust figures. The tables are opened once, from
+the memory-mapped column cache of o2_io.load_table() or through the
+HDF5 file pool in o2_io, and each column is read only when it is
+first used, so loading the full inner_nn table is cheap until its
+data is needed.
 """
 
-import o2sclpy
+import os
 import numpy
-    
+import o2_io
+import bench
+
+""" -------------------------------------------------------------------
+A column of an O2scl table which is read when it is first used
+"""
+class crust_column:
+
+    def __init__(self,dset,n):
+        # The HDF5 dataset or memory-mapped array, and the number of
+        # rows in the table
+        self.dset=dset
+        self.n=n
+        # The column as an array, once it has been read
+        self.data=None
+
+    def __len__(self):
+        return self.n
+
+    # Read the whole column, if it has not been read already
+    def load(self):
+        if self.data is None:
+            self.data=self.dset[0:self.n]
+        return self.data
+
+    # Allow numpy and matplotlib to use the column as an array
+    def __array__(self,dtype=None,copy=None):
+        if dtype is None:
+            return self.load()
+        return self.load().astype(dtype)
+
+    """
+    Index the column. Before the column has been read, slices with a
+    positive step are read directly from the file, without reading
+    the rest of the column.
+    """
+    def __getitem__(self,key):
+        if self.data is None and isinstance(key,slice):
+            (start,stop,step)=key.indices(self.n)
+            if step>0:
+                return self.dset[start:stop:step]
+        return self.load()[key]
+
+    # Iterate over the column in chunks of at most chunk_size rows
+    def chunks(self,chunk_size=100000):
+        for start in range(0,self.n,chunk_size):
+            yield self[start:min(start+chunk_size,self.n)]
+
+""" -------------------------------------------------------------------
+Class definition
+"""
 class load_crust:
 
-    # Crust data
-    w_nn=[]
-    r_nn=[]
-
-    w_nnuc=[]
-    r_nnuc=[]
-    Rn_nnuc=[]
-    A_nnuc=[]
-    nb_nnuc=[]
-
-    w_nnuc_outer=[]
-    r_nnuc_outer=[]
-    Rn_nnuc_outer=[]
-    A_nnuc_outer=[]
-    nb_nnuc_outer=[]
-
-    rho_108=0
-    rho_109=0
-    rho_110=0
-    rho_111=0
-    rho_112=0
-    rho_113=0
-
-    rho_114=0
-    rho_115=0
-    rho_116=0
-    rho_117=0
+    # The file and the table name for each set of crust data. The
+    # columns are available as attributes named <column>_<set>,
+    # e.g. w_nn, r_nnuc or Rn_nnuc_outer.
+    tables={'nn':('inner_nn.o2','inner_nn'),
+            'nnuc':('inner_nnuc.o2','inner_nnuc'),
+            'nnuc_outer':('outer_nnuc.o2','outer_nnuc')}
+    # If True, read the tables from the column cache
+    use_cache=True
+
+    def __init__(self):
+        # Columns which have been used, indexed by (set,column)
+        self.columns={}
+        # Radii of the inner and outer crust nuclei in increasing
+        # order, and the logarithms of the corresponding baryon
+        # densities, from index()
+        self.r_sorted=[]
+        self.log_nb_sorted=[]
+
+    # Return the crust_column for column 'col' of data set 'name'
+    def column(self,name,col):
+        if (name,col) not in self.columns:
+            (fname,tname)=self.tables[name]
+            if self.use_cache:
+                arr=o2_io.load_table(fname,tname,[col])[col]
+                self.columns[(name,col)]=crust_column(arr,len(arr))
+            else:
+                tab=o2_io.h5read_type_named(fname,'table',tname)
+                self.columns[(name,col)]=crust_column(tab['data/'+col],
+                                                      o2_io.table_nlines(tab))
+        return self.columns[(name,col)]
 
+    # Look up attributes like w_nn as columns
+    def __getattr__(self,attr):
+        if attr.startswith('__') or attr=='columns':
+            raise AttributeError(attr)
+        (col,sep,name)=attr.partition('_')
+        if name not in self.tables:
+            raise AttributeError(attr)
+        return self.column(name,col)
+
+    """
+    Open the crust tables and sort the nuclei by radius. The columns
+    themselves are read when they are used.
+    """
     def load(self):
-    
-        # Read inner crust data for neutrons
-        if len(self.w_nn)==0:
-            hr=o2sclpy.hdf5_reader()
-            (nn_tab,loc_type)=hr.h5read_name('inner_nn.o2',
-                                             'inner_nn')
-            self.w_nn=nn_tab['data/w']
-            self.r_nn=nn_tab['data/r']
-            self.w_nn=self.w_nn[:100000]
-            self.r_nn=self.r_nn[:100000]
-            print('Loaded',len(self.w_nn),'nucleons.')
-            
-        # Read inner crust data for nuclei
-        if len(self.w_nnuc)==0:
-            (nnuc_tab,loc_type)=hr.h5read_name('inner_nnuc.o2',
-                                               'inner_nnuc')
-            self.w_nnuc=nnuc_tab['data/w']
-            self.r_nnuc=nnuc_tab['data/r']
-            self.Rn_nnuc=nnuc_tab['data/Rn']
-            self.A_nnuc=nnuc_tab['data/A']
-            self.nb_nnuc=nnuc_tab['data/nb']
-            
-            nb_nnuc_temp=[abs(self.r_nnuc[i]-10.8)
-                          for i in range(0,len(self.r_nnuc))]
-            self.rho_108=self.nb_nnuc[numpy.argmin(nb_nnuc_temp)]*2.8e14/0.16
-            nb_nnuc_temp=[abs(self.r_nnuc[i]-10.9)
-                          for i in range(0,len(self.r_nnuc))]
-            self.rho_109=self.nb_nnuc[numpy.argmin(nb_nnuc_temp)]*2.8e14/0.16
-            nb_nnuc_temp=[abs(self.r_nnuc[i]-11.0)
-                          for i in range(0,len(self.r_nnuc))]
-            self.rho_110=self.nb_nnuc[numpy.argmin(nb_nnuc_temp)]*2.8e14/0.16
-            nb_nnuc_temp=[abs(self.r_nnuc[i]-11.1)
-                          for i in range(0,len(self.r_nnuc))]
-            self.rho_111=self.nb_nnuc[numpy.argmin(nb_nnuc_temp)]*2.8e14/0.16
-            nb_nnuc_temp=[abs(self.r_nnuc[i]-11.2)
-                          for i in range(0,len(self.r_nnuc))]
-            self.rho_112=self.nb_nnuc[numpy.argmin(nb_nnuc_temp)]*2.8e14/0.16
-            nb_nnuc_temp=[abs(self.r_nnuc[i]-11.3)
-                          for i in range(0,len(self.r_nnuc))]
-            self.rho_113=self.nb_nnuc[numpy.argmin(nb_nnuc_temp)]*2.8e14/0.16
-            
-            print('Loaded',len(self.w_nnuc),
-                  'nuclei for inner crust.')
-
-
-        # Read outer crust data for nuclei
-        if len(self.w_nnuc_outer)==0:
-            hr=o2sclpy.hdf5_reader()
-            (nnuc_tab_outer,loc_type)=hr.h5read_name('outer_nnuc.o2',
-                                                     'outer_nnuc')
-            self.w_nnuc_outer=nnuc_tab_outer['data/w']
-            self.r_nnuc_outer=nnuc_tab_outer['data/r']
-            self.Rn_nnuc_outer=nnuc_tab_outer['data/Rn']
-            self.A_nnuc_outer=nnuc_tab_outer['data/A']
-            self.nb_nnuc_outer=nnuc_tab_outer['data/nb']
-            nb_nnuc_temp=[abs(self.r_nnuc_outer[i]-11.4)
-                          for i in range(0,len(self.r_nnuc_outer))]
-            self.rho_114=(self.nb_nnuc_outer[numpy.argmin(nb_nnuc_temp)]*
-                          2.8e14/0.16)
-            nb_nnuc_temp=[abs(self.r_nnuc_outer[i]-11.5)
-                          for i in range(0,len(self.r_nnuc_outer))]
-            self.rho_115=(self.nb_nnuc_outer[numpy.argmin(nb_nnuc_temp)]*
-                          2.8e14/0.16)
-            nb_nnuc_temp=[abs(self.r_nnuc_outer[i]-11.6)
-                          for i in range(0,len(self.r_nnuc_outer))]
-            self.rho_116=(self.nb_nnuc_outer[numpy.argmin(nb_nnuc_temp)]*
-                          2.8e14/0.16)
-            nb_nnuc_temp=[abs(self.r_nnuc_outer[i]-11.7)
-                          for i in range(0,len(self.r_nnuc_outer))]
-            self.rho_117=(self.nb_nnuc_outer[numpy.argmin(nb_nnuc_temp)]*
-                          2.8e14/0.16)
-            
-            print('Loaded',len(self.w_nnuc_outer),
-                  'nuclei for outer crust.')
-            
+        print('Loaded',len(self.w_nn),'nucleons.')
+        print('Loaded',len(self.w_nnuc),
+              'nuclei for inner crust.')
+        print('Loaded',len(self.w_nnuc_outer),
+              'nuclei for outer crust.')
+        self.index()
+
+    """
+    Sort the radii of the inner and outer crust nuclei, which
+    density_at() searches
+    """
+    def index(self):
+        r=numpy.concatenate((self.r_nnuc,self.r_nnuc_outer))
+        nb=numpy.concatenate((self.nb_nnuc,self.nb_nnuc_outer))
+        order=numpy.argsort(r)
+        self.r_sorted=r[order]
+        self.log_nb_sorted=numpy.log(nb[order])
+
+    """
+    Return the mass density in g/cm^3 at each of the radii (in km),
+    interpolating the logarithm of the baryon density of the nuclei
+    between the neighboring radii. The radii are found by binary
+    search in the sorted radii, so any number of radii can be given
+    at once.
+    """
+    def density_at(self,radii):
+        if len(self.r_sorted)==0:
+            self.index()
+        nb=numpy.exp(numpy.interp(radii,self.r_sorted,self.log_nb_sorted))
+        return nb*o2_io.unit_factor('1/fm^3','g/cm^3')
+
+    """
+    Histogram the inner crust neutrons on a grid with nr bins in r and
+    nw bins in w, reading inner_nn in chunks of chunk_size rows so
+    that the memory used does not depend on the number of neutrons.
+    The ranges default to the range of the data. Returns
+    (counts,r_range,w_range), where counts has shape (nw,nr) as
+    imshow() expects.
+    """
+    def nn_histogram(self,nr=400,nw=200,r_range=None,w_range=None,
+                     chunk_size=100000):
+        r=self.r_nn
+        w=self.w_nn
+        if r_range is None:
+            r_range=(min(numpy.min(x) for x in r.chunks(chunk_size)),
+                     max(numpy.max(x) for x in r.chunks(chunk_size)))
+        if w_range is None:
+            w_range=(min(numpy.min(x) for x in w.chunks(chunk_size)),
+                     max(numpy.max(x) for x in w.chunks(chunk_size)))
+        counts=numpy.zeros(nw*nr)
+        for (rc,wc) in zip(r.chunks(chunk_size),w.chunks(chunk_size)):
+            ir=numpy.floor((rc-r_range[0])/(r_range[1]-r_range[0])*nr)
+            iw=numpy.floor((wc-w_range[0])/(w_range[1]-w_range[0])*nw)
+            # Include points on the upper edges in the last bins
+            ir=numpy.where(rc==r_range[1],nr-1,ir)
+            iw=numpy.where(wc==w_range[1],nw-1,iw)
+            ok=(ir>=0)&(ir<nr)&(iw>=0)&(iw<nw)
+            counts+=numpy.bincount((iw[ok]*nr+ir[ok]).astype(int),
+                                   minlength=nw*nr)
+        return (counts.reshape(nw,nr),r_range,w_range)
+
+    """
+    Draw the inner crust neutrons on the axes 'ax' as one image from
+    nn_histogram() instead of one marker per neutron, so that the
+    time to draw and the size of the output do not depend on the
+    number of neutrons. Each pixel has the given color with an
+    opacity of 1-exp(-counts/scale), the fraction of the pixel which
+    randomly placed markers would cover. The default scale is the
+    mean of the nonzero counts.
+    """
+    def nn_image(self,ax,color=(0.9,0.9,1.0),scale=None,nr=400,nw=200,
+                 r_range=None,w_range=None,zorder=1):
+        (counts,r_range,w_range)=self.nn_histogram(nr,nw,r_range,w_range)
+        if scale is None:
+            scale=numpy.mean(counts[counts>0]) if numpy.any(counts>0) else 1
+        img=numpy.zeros((nw,nr,4))
+        img[:,:,0:3]=color
+        img[:,:,3]=1.0-numpy.exp(-counts/scale)
+        return ax.imshow(img,extent=(r_range[0],r_range[1],w_range[0],
+                                     w_range[1]),origin='lower',
+                         aspect='auto',interpolation='nearest',
+                         zorder=zorder)
+
+    """
+    Compare drawing the first n neutrons of inner_nn as markers, as
+    the crust notebook did, with nn_image() for all of them, printing
+    the time to draw and save each and the size of the output
+    """
+    def bench_nn_image(self,n=100000,fname='bench_nn.png'):
+        import matplotlib.pyplot as plot
+        for mode in ['markers','image']:
+            fig=plot.figure(figsize=(6.0,3.0))
+            ax=fig.add_subplot(1,1,1)
+            def draw():
+                if mode=='markers':
+                    ax.plot(self.r_nn[0:n],self.w_nn[0:n],marker='o',lw=0,
+                            mfc=(0.9,0.9,1.0),mec=(0.9,0.9,1.0),mew=0.0,
+                            ms=2.0)
+                else:
+                    self.nn_image(ax)
+                fig.savefig(fname)
+            dt=bench.timed(draw)[1]
+            plot.close(fig)
+            bench.report(mode.ljust(8)+' '+str(os.path.getsize(fname))+
+                         ' bytes,',[('time',dt)])
+        os.remove(fname)
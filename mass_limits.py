@@ -0,0 +1,280 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+The neutron star properties quoted by nstar_plot.mass_limits(),
+computed from a set of EOS tables.
+
+For each EOS, a sequence of stars is integrated with tov.py and
+reduced to the maximum mass, the central energy density and baryon
+density of the maximum mass star, and the tidal deformability and
+moment of inertia of a star with mass m_canonical. The stars of many
+EOSs are integrated together in one batch. The results are cached in
+a JSON file by a hash of each EOS table and the solver settings, so
+only new EOSs are computed on later runs.
+
+Usage: python mass_limits.py file.o2 [file.o2 ...]
+"""
+
+import os
+import sys
+import json
+import hashlib
+import numpy
+import o2_io
+import tov
+import bench
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class mass_limits:
+
+    # Mass of the star for the tidal deformability and moment of
+    # inertia, in solar masses
+    m_canonical=1.4
+    # Number of stars per EOS
+    n_stars=100
+    # Smallest central energy density in 1/fm^4
+    ed_min=0.5
+    # Number of EOSs integrated together in each batch
+    batch_size=1000
+    # Cache of results, indexed by EOS hash, or None for no cache
+    cache_file='mass_limits_cache.json'
+    # The results for each EOS
+    keys=['M_max','ed_max','nb_max','R','lambda','I']
+
+    def __init__(self):
+        self.solver=tov.tov_solver()
+
+    """
+    Return a hash of an EOS table and the settings which affect the
+    results
+    """
+    def eos_hash(self,ed,pr,nb):
+        h=hashlib.sha256()
+        for arr in [ed,pr,nb]:
+            if arr is not None:
+                h.update(numpy.ascontiguousarray(arr,dtype='f8').tobytes())
+            h.update(b';')
+        settings=[self.m_canonical,self.n_stars,self.ed_min,
+                  self.solver.n_steps,self.solver.n_center,
+                  self.solver.n_grid]
+        h.update(json.dumps(settings).encode('utf-8'))
+        return h.hexdigest()
+
+    # Read the cache file
+    def read_cache(self):
+        if self.cache_file is None or not os.path.isfile(self.cache_file):
+            return {}
+        with open(self.cache_file) as f:
+            return json.load(f)
+
+    # Write the cache file
+    def write_cache(self,cache):
+        if self.cache_file is None:
+            return
+        with open(self.cache_file,'w') as f:
+            json.dump(cache,f,indent=1,sort_keys=True)
+
+    """
+    Read the EOSs from the tables whose names start with eos_prefix
+    in the files 'fnames', returning a list of (ed,pr,nb) with ed and
+    pr in 1/fm^4 and nb in 1/fm^3, or None if a table has no nb
+    """
+    def read_eos(self,fnames,eos_prefix='full_eos'):
+        ret=[]
+        for fname in fnames:
+            f=o2_io.default_index.open(fname)
+            for name in o2_io.default_index.names_of_type(fname,'table'):
+                if not name.split('/')[-1].startswith(eos_prefix):
+                    continue
+                cols=['ed','pr']
+                if 'nb' in f[name]['data']:
+                    cols.append('nb')
+                eos=o2_io.read_columns(f[name],cols)
+                ret.append((eos['ed'],eos['pr'],eos.get('nb')))
+        return ret
+
+    """
+    Integrate the stars for a list of EOSs in one batch and return a
+    dictionary of arrays with one entry per EOS for each of the keys
+    """
+    def compute_batch(self,eos_list):
+        ts=self.solver
+        ts.set_eos_list(eos_list)
+        n=len(eos_list)
+        fact=o2_io.unit_factor('1/fm^4','1/km^2')
+        ed_top=numpy.array([t['ed'][-1] for t in ts.tables])/fact
+        # Central energy densities, one row for each EOS
+        x=numpy.linspace(0.0,1.0,self.n_stars)
+        ed_c=numpy.exp(numpy.log(self.ed_min)+
+                       numpy.outer(numpy.log(ed_top/self.ed_min),x))
+        ieos=numpy.repeat(numpy.arange(n),self.n_stars)
+        res=ts.integrate(ed_c.ravel(),ieos)
+        res=dict((k,v.reshape(n,self.n_stars)) for (k,v) in res.items())
+        rows=numpy.arange(n)
+        imax=numpy.argmax(res['gm'],axis=1)
+        ret={'M_max':res['gm'][rows,imax],
+             'ed_max':ed_c[rows,imax]*o2_io.unit_factor('1/fm^4',
+                                                        'MeV/fm^3'),
+             'nb_max':numpy.full(n,numpy.nan)}
+        for (i,tab) in enumerate(ts.tables):
+            if tab['nb'] is not None:
+                log_ed_c=numpy.log(ed_c[i,imax[i]]*fact)
+                ret['nb_max'][i]=numpy.interp(log_ed_c,numpy.log(tab['ed']),
+                                              tab['nb'])
+        # Interpolate to m_canonical on the stable branch
+        stable=numpy.arange(self.n_stars)[None,:]<=imax[:,None]
+        gm=numpy.where(stable,res['gm'],-numpy.inf)
+        j=numpy.argmax(gm>=self.m_canonical,axis=1)
+        ok=(ret['M_max']>=self.m_canonical)&(j>0)
+        j=numpy.maximum(j,1)
+        m0=gm[rows,j-1]
+        m1=gm[rows,j]
+        frac=(self.m_canonical-m0)/(m1-m0)
+        for (key,col) in [('R','r'),('lambda','lambda'),('I','I')]:
+            q0=res[col][rows,j-1]
+            q1=res[col][rows,j]
+            ret[key]=numpy.where(ok,q0+frac*(q1-q0),numpy.nan)
+        return ret
+
+    """
+    Compute the results for a list of EOSs, taking those which have
+    been computed before from the cache, and return a dictionary of
+    arrays with one entry per EOS for each of the keys
+    """
+    def compute(self,eos_list):
+        cache=self.read_cache()
+        hashes=[self.eos_hash(*eos) for eos in eos_list]
+        todo=[i for i in range(0,len(eos_list)) if hashes[i] not in cache]
+        for start in range(0,len(todo),self.batch_size):
+            batch=todo[start:start+self.batch_size]
+            res=self.compute_batch([eos_list[i] for i in batch])
+            for (k,i) in enumerate(batch):
+                # JSON has no NaN, so missing values are stored as None
+                cache[hashes[i]]=dict((key,None if numpy.isnan(res[key][k])
+                                       else float(res[key][k]))
+                                      for key in self.keys)
+        if len(todo)>0:
+            self.write_cache(cache)
+        return dict((key,numpy.array([numpy.nan if cache[h][key] is None
+                                      else cache[h][key] for h in hashes]))
+                    for key in self.keys)
+
+    """
+    Return the range (min,max) of each result, ignoring missing
+    values. Results which are missing for every EOS, such as nb_max
+    when no table has nb or lambda when no EOS reaches m_canonical,
+    are left out.
+    """
+    def ranges(self,res):
+        if len(res['M_max'])==0:
+            raise RuntimeError('No EOS tables found.')
+        return dict((key,(numpy.nanmin(res[key]),numpy.nanmax(res[key])))
+                    for key in self.keys
+                    if numpy.any(numpy.isfinite(res[key])))
+
+    # Format a number with two significant figures
+    def fmt(self,x):
+        return '%g' % float('%.2g' % x)
+
+    """
+    Return the text for the labels in nstar_plot.mass_limits() from
+    the ranges given by ranges(). The label of a quantity which is
+    missing from the ranges is left out.
+    """
+    def label_text(self,rng):
+        ret=[]
+        if 'lambda' in rng:
+            lam=rng['lambda']
+            ret.append(r'$\lambda=('+self.fmt(lam[0]/1.0e36)+'-'+
+                       self.fmt(lam[1]/1.0e36)+r'){\times}10^{36}~'+
+                       r'\mathrm{g}~\mathrm{cm}^2~\mathrm{s}^2$')
+        if 'I' in rng:
+            ret.append(r'$I='+self.fmt(rng['I'][0])+'-'+
+                       self.fmt(rng['I'][1])+
+                       r'~\mathrm{M}_{\odot}~\mathrm{km}^2$')
+        ret.append(r'$\varepsilon_{\mathrm{core}}='+
+                   self.fmt(rng['ed_max'][0])+'-'+
+                   self.fmt(rng['ed_max'][1])+
+                   r'~\mathrm{MeV}/\mathrm{fm}^{3}$')
+        if 'nb_max' in rng:
+            ret.append(r'$n_{B,\mathrm{max}}='+self.fmt(rng['nb_max'][0])+
+                       '-'+self.fmt(rng['nb_max'][1])+
+                       r'~\mathrm{fm}^{-3}$')
+        ret.append(r'$M_{\mathrm{min}}{\approx}1\mathrm{M}_{\odot}$ ;'+
+                   r' $M_{\mathrm{max}}>'+
+                   ('%g' % (numpy.floor(rng['M_max'][0]*10.0)/10.0))+
+                   r'\mathrm{M}_{\odot}$')
+        return ret
+
+    # Return the label text for the EOSs in the files 'fnames'
+    def run(self,fnames,eos_prefix='full_eos'):
+        return self.label_text(self.ranges(self.compute(
+            self.read_eos(fnames,eos_prefix))))
+
+    """
+    Check the labels for an EOS which has no nb column and whose
+    maximum mass is below m_canonical: lambda, I and n_B are left
+    out and no label contains 'nan'
+    """
+    def check_missing(self):
+        cache_file=self.cache_file
+        self.cache_file=None
+        ed=numpy.logspace(-6,1.5,600)
+        lines=self.label_text(self.ranges(self.compute([(ed,0.01*ed**2,
+                                                         None)])))
+        self.cache_file=cache_file
+        if len(lines)!=2 or any('nan' in x for x in lines):
+            raise RuntimeError('Labels with missing values: '+str(lines))
+        return lines
+
+    """
+    Time compute() without the cache for n_eos random EOSs, each a
+    polytrope in the core joined to a gamma=4/3 polytrope below
+    ed_trans (in 1/fm^4)
+    """
+    def bench_compute(self,n_eos=1000,ed_trans=0.3):
+        rng=numpy.random.default_rng(0)
+        ed=numpy.logspace(-6,1.5,600)
+        eos_list=[]
+        for i in range(0,n_eos):
+            gam=rng.uniform(2.4,3.0)
+            k=rng.uniform(0.02,0.05)
+            pr=numpy.where(ed<ed_trans,k*ed_trans**(gam-4.0/3.0)*
+                           ed**(4.0/3.0),k*ed**gam)
+            eos_list.append((ed,pr,ed/4.8))
+        cache_file=self.cache_file
+        self.cache_file=None
+        (res,dt)=bench.timed(self.compute,eos_list)
+        self.cache_file=cache_file
+        bench.report(str(n_eos)+' EOSs:',[('total',dt),
+                                          ('per EOS',dt/n_eos)],4)
+        return res
+
+""" -------------------------------------------------------------------
+Print the label text
+"""
+
+if __name__=='__main__':
+    ml=mass_limits()
+    for line in ml.run(sys.argv[1:]):
+        print(line)
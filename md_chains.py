@@ -0,0 +1,232 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Crust relaxation with several independent mini_md chains in a
+process pool, keeping the chain which reaches the lowest energy.
+
+Each chain starts from the same nuclei table with its own random
+seed and writes its state to a checkpoint file every
+checkpoint_steps steps. The random numbers for each block of
+checkpoint_steps steps are seeded by the chain and the block, so a
+run which is interrupted resumes from the last checkpoint and gives
+the same result as a run which is not. A checkpoint records the
+input file, table, file stamp and number of nuclei along with the
+settings, and is ignored if any of them has changed. The energy of
+each chain is recorded against the wall time at every checkpoint and
+printed at the end.
+
+The result is written to a new table, <table>_relaxed, unless the
+input table is overwritten on request with the overwrite attribute.
+
+Usage: python md_chains.py file.o2 table [n_steps] [cutoff]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+import o2_io
+import mini_md
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class md_chains:
+
+    # Number of chains, or None for one per core
+    n_chains=None
+    # Number of steps between checkpoints
+    checkpoint_steps=10000
+    # Chain k is checkpointed to <checkpoint_prefix>_<k>.o2
+    checkpoint_prefix='md_checkpoint'
+    # If False, the checkpoints are removed when the run is complete
+    keep_checkpoints=False
+    # Cutoff for mini_md, or None to use all pairs
+    cutoff=None
+    # Seed for the random number generators of the chains
+    seed=0
+    # If True, run() writes the result to the input table by default,
+    # otherwise writing to the input table is an error
+    overwrite=False
+
+    def __init__(self):
+        # The table with the initial nuclei, the stamp of its file
+        # and the number of nuclei, from run()
+        self.fname=''
+        self.name=''
+        self.stamp=[0,0]
+        self.n_nuclei=0
+
+    # Return the name of the checkpoint file for chain k
+    def checkpoint_name(self,k):
+        return self.checkpoint_prefix+'_'+str(k)+'.o2'
+
+    """
+    Return the table constants of a checkpoint after 'step' steps:
+    the step, the settings which change the result and the stamp and
+    size of the input
+    """
+    def settings(self,step):
+        return {'step':step,'seed':self.seed,
+                'n_steps_per':self.checkpoint_steps,
+                'cutoff':self.cutoff or 0.0,'mtime_ns':self.stamp[0],
+                'file_size':self.stamp[1],'n_nuclei':self.n_nuclei}
+
+    """
+    Write the state of chain k after 'step' steps, and the history of
+    (time,step,energy), to its checkpoint file. The file is written
+    under a temporary name and then renamed, so an interrupted write
+    leaves the previous checkpoint intact.
+    """
+    def write_checkpoint(self,k,md,step,history):
+        cname=self.checkpoint_name(k)
+        tmp=cname+'.tmp'
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        o2_io.write_table(tmp,'chain',[('r',md.r_nnuc),('w',md.w_nnuc)],
+                          constants=self.settings(step))
+        with o2_io.h5py.File(tmp,'a') as f:
+            o2_io.write_string_array(f.create_group('source'),
+                                     [os.path.abspath(self.fname),
+                                      self.name])
+        history=numpy.array(history)
+        o2_io.write_table(tmp,'history',[('time',history[:,0]),
+                                         ('step',history[:,1]),
+                                         ('energy',history[:,2])],
+                          {'time':'s'})
+        os.replace(tmp,cname)
+
+    """
+    Read the checkpoint of chain k, returning (w,step,history), or
+    None if there is no checkpoint from a run with the same settings
+    and the same input
+    """
+    def read_checkpoint(self,k):
+        cname=self.checkpoint_name(k)
+        if not os.path.isfile(cname):
+            return None
+        o2_io.load_h5py()
+        with o2_io.h5py.File(cname,'r') as f:
+            con=o2_io.table_constants(f['chain'])
+            expected=self.settings(con.get('step',-1.0))
+            if any(con.get(c)!=float(v) for (c,v) in expected.items()):
+                return None
+            source=[]
+            if 'source' in f:
+                source=o2_io.read_string_array(f['source'])
+            if source!=[os.path.abspath(self.fname),self.name]:
+                return None
+            w=o2_io.read_columns(f['chain'],['w'])['w']
+            hist=o2_io.read_columns(f['history'],['time','step','energy'])
+        history=[tuple(x) for x in zip(hist['time'],hist['step'],
+                                       hist['energy'])]
+        return (w,int(con['step']),history)
+
+    """
+    Run chain k for n_steps steps, resuming from its checkpoint if
+    there is one, and return (w,history)
+    """
+    def run_chain(self,k,n_steps):
+        md=mini_md.mini_md()
+        md.cutoff=self.cutoff
+        md.verbose=False
+        md.read(self.fname,self.name)
+        ck=self.read_checkpoint(k)
+        if ck is None:
+            step=0
+            history=[(0.0,0,md.energy())]
+        else:
+            (w,step,history)=ck
+            md.set_nuclei(md.r_nnuc,w)
+        # Continue the wall time from the checkpoint
+        t0=time.time()-history[-1][0]
+        energy=history[-1][2]
+        while step<n_steps:
+            m=min(self.checkpoint_steps,n_steps-step)
+            md.seed=[self.seed,k,step//self.checkpoint_steps]
+            energy+=md.solve(m)
+            step+=m
+            history.append((time.time()-t0,step,energy))
+            self.write_checkpoint(k,md,step,history)
+        return (md.w_nnuc,numpy.array(history))
+
+    """
+    Relax the nuclei in table 'name' of file 'fname' with n_chains
+    chains of n_steps steps each (by default one per nucleus), write
+    the lowest energy result to table out_name of file out_fname and
+    return the (w,history) of each chain. By default the result goes
+    to table <name>_relaxed of the input file, or to the input table
+    if overwrite is True.
+    """
+    def run(self,fname,name,n_steps=None,out_fname=None,out_name=None):
+        if out_fname is None:
+            out_fname=fname
+        if out_name is None:
+            out_name=name if self.overwrite else name+'_relaxed'
+        if (not self.overwrite and out_name==name and
+            os.path.abspath(out_fname)==os.path.abspath(fname)):
+            raise RuntimeError('Not overwriting the input table '+name+
+                               ' in '+fname+' (set overwrite=True).')
+        self.fname=fname
+        self.name=name
+        md=mini_md.mini_md()
+        md.read(fname,name)
+        self.stamp=o2_io.default_index.file_stamp(fname)
+        self.n_nuclei=len(md.r_nnuc)
+        if n_steps is None:
+            n_steps=len(md.w_nnuc)
+        n_chains=self.n_chains
+        if n_chains is None:
+            n_chains=os.cpu_count()
+        with ProcessPoolExecutor(max_workers=n_chains) as pool:
+            res=list(pool.map(self.run_chain,range(0,n_chains),
+                              [n_steps]*n_chains))
+        self.report(res)
+        best=numpy.argmin([h[-1,2] for (w,h) in res])
+        print('Keeping chain '+str(best)+'.')
+        md.set_nuclei(md.r_nnuc,res[best][0])
+        md.write(out_fname,out_name)
+        if not self.keep_checkpoints:
+            for k in range(0,n_chains):
+                os.remove(self.checkpoint_name(k))
+        return res
+
+    # Print the energy of each chain against the wall time
+    def report(self,res):
+        for (k,(w,history)) in enumerate(res):
+            print('Chain '+str(k)+':')
+            print('  time (s)      step        energy')
+            for (t,step,energy) in history:
+                print(('%10.2f' % t)+('%10d' % step)+('%14.6e' % energy))
+
+""" -------------------------------------------------------------------
+Relax the nuclei in a table
+"""
+
+if __name__=='__main__':
+    mc=md_chains()
+    n_steps=None
+    if len(sys.argv)>3:
+        n_steps=int(sys.argv[3])
+    if len(sys.argv)>4:
+        mc.cutoff=float(sys.argv[4])
+    mc.run(sys.argv[1],sys.argv[2],n_steps)
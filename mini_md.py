@@ -0,0 +1,278 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+The crust relaxation of mini_md in crust_plot.cpp, which moves the
+nuclei in w to minimize the sum of 1/d^2 over all pairs of nuclei.
+
+Each Monte Carlo step moves one nucleus by +step or -step in w if
+that lowers the energy. Only the energy of the moved nucleus with
+the others is computed for each step, so a step is O(N) instead of
+the O(N^2) of the three energy2() calls in crust_plot.cpp. With a
+cutoff, the nuclei are sorted into cells at least as wide as the
+cutoff and only the nuclei in the neighboring cells are used, so a
+step takes a time which does not depend on N.
+
+The coordinate w is periodic with period 1, and distances use the
+nearest periodic image in w. (sq_dist() in crust_plot.cpp adds and
+subtracts 1 from r instead, although its comment and the wrapping of
+w in solve() are for a periodic w.)
+
+Usage: python mini_md.py file.o2 table [cutoff]
+"""
+
+import sys
+import itertools
+import numpy
+import o2_io
+import bench
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class mini_md:
+
+    # Size of each move in w
+    step=0.01
+    # Pairs of nuclei farther apart than the cutoff (in the scaled
+    # coordinates of sq_dist()) are ignored, or None to use all pairs
+    cutoff=None
+    # Seed for the random number generator
+    seed=0
+    # If True, print the progress of solve()
+    verbose=True
+
+    def __init__(self):
+        # Coordinates of the nuclei
+        self.w_nnuc=numpy.zeros(0)
+        self.r_nnuc=numpy.zeros(0)
+        # Scales in the w and r directions
+        self.w_scale=1.0
+        self.r_scale=1.0
+        # The other columns of the nuclei table and the units of all
+        # of the columns, from read()
+        self.extra=[]
+        self.units={}
+        # The indices of the nuclei in each cell, the number of cells
+        # in w and r, and the cell row and column of each nucleus,
+        # from grid()
+        self.cells=[]
+        self.n_w=1
+        self.n_r=1
+        self.row=numpy.zeros(0,dtype=int)
+        self.col=numpy.zeros(0,dtype=int)
+
+    # Set the coordinates of the nuclei and sort them into cells
+    def set_nuclei(self,r,w):
+        self.r_nnuc=numpy.array(r,dtype='f8')
+        self.w_nnuc=numpy.array(w,dtype='f8')
+        self.w_scale=1.0
+        self.r_scale=numpy.max(self.r_nnuc)-numpy.min(self.r_nnuc)
+        self.grid()
+
+    """
+    Read the nuclei from table 'name' in file 'fname', keeping the
+    columns other than r and w for write()
+    """
+    def read(self,fname,name):
+        tab=o2_io.h5read_type_named(fname,'table',name)
+        names=o2_io.read_string_array(tab['col_names'])
+        cols=o2_io.read_columns(tab,names)
+        self.units=o2_io.table_units(tab)
+        o2_io.default_index.close(fname)
+        self.extra=[(c,cols[c]) for c in names if c not in ['r','w']]
+        self.set_nuclei(cols['r'],cols['w'])
+
+    # Write the nuclei to table 'name' in file 'fname'
+    def write(self,fname,name):
+        o2_io.write_table(fname,name,[('r',self.r_nnuc),
+                                      ('w',self.w_nnuc)]+self.extra,
+                          self.units)
+
+    """
+    Return the squared distance in the scaled coordinates for the
+    differences dw and dr, using the nearest periodic image in w
+    """
+    def sq_dist(self,dw,dr):
+        dw=dw-numpy.round(dw)
+        return (dw/self.w_scale)**2+(dr/self.r_scale)**2
+
+    """
+    Sort the nuclei into cells. The cells are at least cutoff+step
+    wide in w, so that the neighbors of a nucleus before and after a
+    move are all in the cells next to its own.
+    """
+    def grid(self):
+        if self.cutoff is None:
+            self.n_w=1
+            self.n_r=1
+        else:
+            self.n_w=max(1,int(self.w_scale/(self.cutoff+self.step)))
+            self.n_r=max(1,int(1.0/self.cutoff))
+        y=(self.r_nnuc-numpy.min(self.r_nnuc))/self.r_scale
+        self.row=numpy.minimum((y*self.n_r).astype(int),self.n_r-1)
+        self.col=numpy.minimum((self.w_nnuc*self.n_w).astype(int),
+                               self.n_w-1)
+        self.cells=[[] for i in range(0,self.n_w*self.n_r)]
+        for (i,c) in enumerate(self.row*self.n_w+self.col):
+            self.cells[c].append(i)
+
+    # Return the indices of the nuclei in a cell and the cells next to it
+    def neighbors(self,row,col):
+        if self.cutoff is None:
+            return numpy.arange(len(self.w_nnuc))
+        rows=range(max(row-1,0),min(row+2,self.n_r))
+        cols=set([(col-1)%self.n_w,col,(col+1)%self.n_w])
+        return numpy.fromiter(itertools.chain.from_iterable(
+            self.cells[i*self.n_w+j] for i in rows for j in cols),int)
+
+    """
+    Return the energy of nucleus j with the nuclei 'idx' (which do
+    not include j) with nucleus j moved by each of the shifts in w
+    """
+    def pair_energy(self,j,idx,shifts):
+        d2=self.sq_dist(self.w_nnuc[idx][None,:]-
+                        (self.w_nnuc[j]+shifts)[:,None],
+                        (self.r_nnuc[idx]-self.r_nnuc[j])[None,:])
+        if self.cutoff is not None:
+            d2=numpy.where(d2<self.cutoff**2,d2,numpy.inf)
+        return numpy.sum(1.0/d2,axis=1)
+
+    """
+    Move nucleus j by +step or -step if either lowers the energy, as
+    in mini_md::solve(), and return the change in the energy
+    """
+    def move(self,j):
+        idx=self.neighbors(self.row[j],self.col[j])
+        idx=idx[idx!=j]
+        (e0,ep,em)=self.pair_energy(j,idx,numpy.array([0.0,self.step,
+                                                       -self.step]))
+        if em<e0 and em<ep:
+            dw=-self.step
+            de=em-e0
+        elif ep<e0 and ep<em:
+            dw=self.step
+            de=ep-e0
+        else:
+            return 0.0
+        w=self.w_nnuc[j]+dw
+        if w>1.0:
+            w-=1.0
+        if w<0.0:
+            w+=1.0
+        self.w_nnuc[j]=w
+        col=min(int(w*self.n_w),self.n_w-1)
+        if col!=self.col[j]:
+            self.cells[self.row[j]*self.n_w+self.col[j]].remove(j)
+            self.cells[self.row[j]*self.n_w+col].append(j)
+            self.col[j]=col
+        return de
+
+    """
+    Perform n_steps Monte Carlo steps (by default one per nucleus, as
+    in crust_plot.cpp) and return the total change in the energy
+    """
+    def solve(self,n_steps=None):
+        if n_steps is None:
+            n_steps=len(self.w_nnuc)
+        rng=numpy.random.default_rng(self.seed)
+        js=rng.integers(0,len(self.w_nnuc),n_steps)
+        de=0.0
+        pct=10
+        for (i,j) in enumerate(js):
+            if self.verbose and i>=n_steps*pct/100:
+                print(str(pct)+' percent done.')
+                pct+=10
+            de+=self.move(j)
+        return de
+
+    """
+    Return the total energy, the sum of 1/d^2 over all pairs of
+    nuclei closer than the cutoff, computed in blocks of at most
+    block_size nuclei
+    """
+    def energy(self,block_size=1000):
+        n=len(self.w_nnuc)
+        if self.cutoff is None:
+            blocks=((numpy.arange(i,min(i+block_size,n)),numpy.arange(n))
+                    for i in range(0,n,block_size))
+        else:
+            blocks=((numpy.array(self.cells[c]),
+                     self.neighbors(c//self.n_w,c%self.n_w))
+                    for c in range(0,len(self.cells))
+                    if len(self.cells[c])>0)
+        ret=0.0
+        for (a,b) in blocks:
+            d2=self.sq_dist(self.w_nnuc[b][None,:]-self.w_nnuc[a][:,None],
+                            self.r_nnuc[b][None,:]-self.r_nnuc[a][:,None])
+            keep=b[None,:]>a[:,None]
+            if self.cutoff is not None:
+                keep&=d2<self.cutoff**2
+            ret+=numpy.sum(1.0/d2[keep])
+        return ret
+
+    """
+    Time solve() for n random nuclei in the range of r of the inner
+    crust with and without a cutoff, compared with the three full
+    energy sums per step of crust_plot.cpp for n_slow nuclei. The
+    full sums are O(n^2) per step and O(n^3) for n steps, so they are
+    scaled to n nuclei.
+    """
+    def bench_solve(self,n=100000,cutoff=0.02,n_slow=300,n_exact=2000):
+        rng=numpy.random.default_rng(0)
+        verbose=self.verbose
+        self.verbose=False
+        # The three full energy sums per step of crust_plot.cpp
+        self.cutoff=None
+        self.set_nuclei(rng.uniform(10.8,11.35,n_slow),
+                        rng.uniform(0.0,1.0,n_slow))
+        n_steps=20
+        def full_sums():
+            for j in rng.integers(0,n_slow,n_steps):
+                for dw in [0.0,self.step,-self.step]:
+                    self.w_nnuc[j]+=dw
+                    self.energy()
+                    self.w_nnuc[j]-=dw
+        dt=bench.timed(full_sums)[1]/n_steps*(float(n)/n_slow)**2*n
+        bench.report(('Full sums, '+str(n)+':').ljust(22),
+                     [('estimated from '+str(n_slow),dt)],1)
+        for (cut,m) in [(None,n_exact),(cutoff,n)]:
+            self.cutoff=cut
+            self.set_nuclei(rng.uniform(10.8,11.35,m),
+                            rng.uniform(0.0,1.0,m))
+            dt=bench.timed(self.solve)[1]
+            bench.report(('Cutoff '+str(cut)+', '+str(m)+':').ljust(22),
+                         [('total',dt),('per step',dt/m)],6)
+        self.verbose=verbose
+
+""" -------------------------------------------------------------------
+Relax the nuclei in a table
+"""
+
+if __name__=='__main__':
+    md=mini_md()
+    if len(sys.argv)>3:
+        md.cutoff=float(sys.argv[3])
+    md.read(sys.argv[1],sys.argv[2])
+    e0=md.energy()
+    print('Energy before: '+('%.6e' % e0))
+    de=md.solve()
+    print('Energy after:  '+('%.6e' % (e0+de)))
+    md.write(sys.argv[1],sys.argv[2])
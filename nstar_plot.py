@@ -24,15 +24,36 @@ along with this neutron star plot. If not, see
 
 """
 
-import os
 import math
+import numpy
 from math import cos
 from math import sin
 from math import sqrt
-from matplotlib.patches import Ellipse
-from matplotlib.patches import Rectangle
-from pylab import rand
-import matplotlib.pyplot as plot
+from numpy.random import rand
+import tex_labels
+import bench
+
+# Matplotlib is not imported until load_matplotlib() is called when
+# the first figure is created, so that importing this module is fast
+plot=None
+
+"""
+Import pyplot and the matplotlib classes used below into the module
+namespace
+"""
+def load_matplotlib():
+    global plot,Ellipse,Rectangle,PathPatch,Path
+    global PatchCollection,EllipseCollection,LineCollection
+    if plot is not None:
+        return
+    from matplotlib.patches import Ellipse
+    from matplotlib.patches import Rectangle
+    from matplotlib.patches import PathPatch
+    from matplotlib.path import Path
+    from matplotlib.collections import PatchCollection
+    from matplotlib.collections import EllipseCollection
+    from matplotlib.collections import LineCollection
+    import matplotlib.pyplot as plot
 
 """ -------------------------------------------------------------------
 Class definition
@@ -58,10 +79,24 @@ class nstar_plot:
     fig=0
     # Axis object
     ax=0
+    # Cutaway arcs from cutaway_arcs(), indexed by (factor,N2)
+    cutaway_cache={}
+    # Text for mass_limits(), one label per line, which can be
+    # computed from EOS tables with compute_mass_limits()
+    mass_limits_text=[(r'$\lambda=(0.2-6){\times}10^{36}~'+
+                       r'\mathrm{g}~\mathrm{cm}^2~\mathrm{s}^2$'),
+                      r'$I=50-200~\mathrm{M}_{\odot}~\mathrm{km}^2$',
+                      (r'$\varepsilon_{\mathrm{core}}='+
+                       r'500-1600~\mathrm{MeV}/\mathrm{fm}^{3}$'),
+                      (r'$n_{B,\mathrm{max}}='+
+                       r'0.6-1.3~\mathrm{fm}^{-3}$'),
+                      (r'$M_{\mathrm{min}}{\approx}1\mathrm{M}_{\odot}$ ;'+
+                       r' $M_{\mathrm{max}}>2\mathrm{M}_{\odot}$')]
     
     # Default plot function from O2scl
     def default_plot(self,lmar=0.14,bmar=0.12,rmar=0.04,tmar=0.04):
-        plot.rc('text',usetex=True)
+        load_matplotlib()
+        tex_labels.setup(plot)
         plot.rc('font',family='serif')
         plot.rcParams['lines.linewidth']=0.5
         self.fig=plot.figure(1,figsize=(8.0,8.0))
@@ -87,10 +122,20 @@ class nstar_plot:
     """
     The star's surface, red and yellow, created from a series of 
     circles
+
+    The default mode, 'ellipse', adds N separate Ellipse patches.
+    Mode 'collection' draws the same circles as one PatchCollection
+    with a color array and mode 'image' computes the gradient as a
+    single res x res RGBA image. Both of the latter produce only one
+    artist.
     """
-    def base_star(self):
+    def base_star(self,mode='ellipse',N=100,res=600):
+        if mode=='image':
+            self.base_star_image(N,res)
+            return
         # Base star
-        N=100
+        patches=[]
+        colors=[]
         ang=0
         for i in range(0,N):
             centx=0.5-float(i)*0.14/N
@@ -99,34 +144,98 @@ class nstar_plot:
             size2=0.6-float(i)*0.56/N
             green=float(i)/N
             base=Ellipse((centx,centy),size1,size2,lw=0,angle=ang)
-            base.set_facecolor((1,green,0))
-            self.ax.add_artist(base)
+            if mode=='collection':
+                patches.append(base)
+                colors.append((1,green,0))
+            else:
+                base.set_facecolor((1,green,0))
+                self.ax.add_artist(base)
+        if mode=='collection':
+            coll=PatchCollection(patches,facecolors=colors,lw=0)
+            self.ax.add_collection(coll,autolim=False)
+
+    """
+    The star's surface as one image
+
+    Circle i has its center at 0.5+(-0.14,0.14)*t and radius
+    0.3-0.28*t, with t=i/N, and each circle lies entirely inside
+    the previous one. The color at a point is thus given by the
+    largest t for which the point is inside the circle, which is
+    the smaller root of a quadratic in t. Rounding t down to a
+    multiple of 1/N gives the same bands as the ellipse version.
+    """
+    def base_star_image(self,N=100,res=600):
+        x=numpy.linspace(0.2,0.8,res+1)
+        x=0.5*(x[1:]+x[:-1])-0.5
+        dx,dy=numpy.meshgrid(x,x)
+        a=-0.0392
+        b=0.28*(dx-dy)+0.168
+        c=dx*dx+dy*dy-0.09
+        inside=c<=0.0
+        disc=numpy.maximum(b*b-4.0*a*c,0.0)
+        t=(-b+numpy.sqrt(disc))/(2.0*a)
+        t=numpy.clip(numpy.floor(t*N)/N,0.0,float(N-1)/N)
+        img=numpy.zeros((res,res,4))
+        img[:,:,0]=1.0
+        img[:,:,1]=t
+        img[:,:,3]=inside
+        # Keep imshow() from resetting the limits set in init()
+        xlim=self.ax.get_xlim()
+        ylim=self.ax.get_ylim()
+        self.ax.imshow(img,extent=(0.2,0.8,0.2,0.8),origin='lower',
+                       interpolation='nearest',aspect='auto',zorder=1)
+        self.ax.set_xlim(xlim)
+        self.ax.set_ylim(ylim)
             
+    """
+    Compare the time to draw and save the star's surface for each
+    of the base_star() modes
+    """
+    def bench_base_star(self,N=100,res=600,fmts=('png','eps')):
+        for mode in ['ellipse','collection','image']:
+            def build():
+                self.init()
+                self.ax.set_axis_off()
+                self.bkgd()
+                self.base_star(mode,N,res)
+                return self.fig
+            bench.figure(mode.ljust(12),build,fmts)
+
     """
     Plot the magnetic field
     
     This is a pure dipole field given by 
     
     \vec{B} = 3 \vec{r} (m dot r)/r^5 - \vec{m}/r^3
+
+    The field is evaluated on an (N+1)x(N+1) grid. If quiver is
+    True, the field is computed with dipole_field() and drawn as one
+    quiver artist with 'density' arrows per unit length, otherwise
+    each arrow is a separate ax.arrow() call. If lines is True,
+    n_lines field lines from field_lines() are drawn instead of
+    arrows.
     """
-    def mag_field(self,ord):
-        mx=0.5
-        my=-0.5
+    def mag_field(self,ord,quiver=False,N=10,density=10,mx=0.5,my=-0.5,
+                  lines=False,n_lines=50):
         fact=400
-        N=10
-        # vector field
-        for i in range(0,N+1):
-            for j in range(0,11):
-                rx=-0.5+float(i)/N
-                ry=-0.5+float(j)/N
-                rmag=sqrt(rx*rx+ry*ry)
-                if rmag>0.3:
-                    dot=mx*rx+my*ry
-                    Bx=(3*rx*dot/rmag**5-mx/rmag**3)/fact
-                    By=(3*ry*dot/rmag**5-my/rmag**3)/fact
-                    self.ax.arrow(rx+0.5+Bx,ry+0.5+By,-Bx,-By,
-                             head_width=0.01,head_length=0.03,color='blue',
-                             zorder=ord)
+        if lines:
+            self.field_lines(ord,n_lines,mx,my)
+        elif quiver:
+            self.mag_quiver(ord,N,density,mx,my,fact)
+        else:
+            # vector field
+            for i in range(0,N+1):
+                for j in range(0,N+1):
+                    rx=-0.5+float(i)/N
+                    ry=-0.5+float(j)/N
+                    rmag=sqrt(rx*rx+ry*ry)
+                    if rmag>0.3:
+                        dot=mx*rx+my*ry
+                        Bx=(3*rx*dot/rmag**5-mx/rmag**3)/fact
+                        By=(3*ry*dot/rmag**5-my/rmag**3)/fact
+                        self.ax.arrow(rx+0.5+Bx,ry+0.5+By,-Bx,-By,
+                                      head_width=0.01,head_length=0.03,
+                                      color='blue',zorder=ord)
         # Arrow for magnetic north
         ang2=3*self.pi/4+0.1
         self.ax.arrow(0.5+0.2*cos(ang2),
@@ -157,6 +266,129 @@ class nstar_plot:
                      ha='center',zorder=ord+1,
                      bbox=dict(facecolor=self.bkgd_color,lw=0))
 
+    """
+    Compute the dipole field for arrays of coordinates rx and ry
+    relative to the center of the star
+
+    Returns Bx, By and a mask which is True for points outside
+    rmag=0.3. The field is set to zero inside the mask.
+    """
+    def dipole_field(self,rx,ry,mx=0.5,my=-0.5):
+        rmag=numpy.sqrt(rx*rx+ry*ry)
+        mask=rmag>0.3
+        rmag=numpy.where(mask,rmag,1.0)
+        dot=mx*rx+my*ry
+        Bx=numpy.where(mask,3*rx*dot/rmag**5-mx/rmag**3,0.0)
+        By=numpy.where(mask,3*ry*dot/rmag**5-my/rmag**3,0.0)
+        return (Bx,By,mask)
+
+    """
+    Draw the dipole field as a single quiver artist
+
+    The field is computed on the full (N+1)x(N+1) grid, and every
+    stride-th point is drawn so that there are about 'density' arrows
+    per unit length independent of N. The shaft and head sizes match
+    the ax.arrow() version, where the head is added beyond the end
+    of the arrow.
+    """
+    def mag_quiver(self,ord,N=10,density=10,mx=0.5,my=-0.5,fact=400):
+        r=numpy.linspace(-0.5,0.5,N+1)
+        rx,ry=numpy.meshgrid(r,r,indexing='ij')
+        Bx,By,mask=self.dipole_field(rx,ry,mx,my)
+        stride=max(int(round(float(N)/density)),1)
+        sel=(slice(None,None,stride),slice(None,None,stride))
+        mask=mask[sel]
+        rx=rx[sel][mask]
+        ry=ry[sel][mask]
+        Bx=Bx[sel][mask]/fact
+        By=By[sel][mask]/fact
+        head_length=0.03
+        Bmag=numpy.sqrt(Bx*Bx+By*By)
+        ext=(Bmag+head_length)/numpy.where(Bmag>0.0,Bmag,1.0)
+        X=rx+0.5+Bx
+        Y=ry+0.5+By
+        U=-Bx*ext
+        V=-By*ext
+        self.ax.quiver(X,Y,U,V,angles='xy',scale_units='xy',scale=1,
+                       units='xy',width=0.001,headwidth=10,headlength=30,
+                       headaxislength=30,color='blue',edgecolor='blue',
+                       linewidth=1.0,zorder=ord)
+        # Include the arrow heads in the data limits, as ax.arrow() does
+        self.ax.update_datalim(numpy.column_stack((X+U,Y+V)))
+
+    """
+    Trace n_lines dipole field lines, all advanced together with a
+    fourth-order Runge-Kutta stepper along the unit vector B/|B|
+
+    The lines start just outside the rmag=0.3 exclusion, at angles
+    evenly spaced over the half of the surface where the field points
+    outward, so that each closed line is traced only once. A line
+    stops when it re-enters rmag=0.3, where its last point is moved
+    onto the circle, or when it leaves the plot. Returns an array of
+    shape (n_lines,n_steps+1,2) in plot coordinates, with NaN after
+    the end of each line, which can be passed directly to a
+    LineCollection or to its set_segments() method.
+    """
+    def trace_field_lines(self,n_lines=200,mx=0.5,my=-0.5,ds=0.002,
+                          n_steps=1000):
+        r0=0.3
+        ang_m=math.atan2(my,mx)
+        ang=ang_m+numpy.linspace(-self.pi/2,self.pi/2,n_lines+2)[1:-1]
+        pos=1.0001*r0*numpy.column_stack((numpy.cos(ang),numpy.sin(ang)))
+        def deriv(p):
+            Bx,By,mask=self.dipole_field(p[:,0],p[:,1],mx,my)
+            Bmag=numpy.sqrt(Bx*Bx+By*By)
+            Bmag=numpy.where(Bmag>0.0,Bmag,1.0)
+            return numpy.column_stack((Bx/Bmag,By/Bmag))
+        path=numpy.full((n_lines,n_steps+1,2),numpy.nan)
+        path[:,0,:]=pos
+        alive=numpy.ones(n_lines,dtype=bool)
+        for k in range(0,n_steps):
+            k1=deriv(pos)
+            k2=deriv(pos+0.5*ds*k1)
+            k3=deriv(pos+0.5*ds*k2)
+            k4=deriv(pos+ds*k3)
+            new=pos+ds/6.0*(k1+2.0*k2+2.0*k3+k4)
+            r_old=numpy.sqrt(numpy.sum(pos*pos,axis=1))
+            r_new=numpy.sqrt(numpy.sum(new*new,axis=1))
+            # Clip lines which re-enter the star at rmag=0.3
+            hit=alive & (r_new<=r0)
+            frac=(r_old[hit]-r0)/(r_old[hit]-r_new[hit])
+            new[hit]=pos[hit]+frac[:,None]*(new[hit]-pos[hit])
+            path[alive,k+1,:]=new[alive]
+            out=numpy.any(numpy.abs(new)>0.5,axis=1)
+            alive=alive & ~hit & ~out
+            if not numpy.any(alive):
+                break
+            pos=new
+        return path+0.5
+
+    """
+    Draw the dipole field lines from trace_field_lines() as one
+    LineCollection, which is returned so that the lines can be
+    re-traced with set_segments() when the moment changes
+    """
+    def field_lines(self,ord,n_lines=50,mx=0.5,my=-0.5):
+        path=self.trace_field_lines(n_lines,mx,my)
+        coll=LineCollection(path,colors='blue',lw=0.5,zorder=ord)
+        self.ax.add_collection(coll,autolim=False)
+        return coll
+
+    """
+    Compare the time to compute and save the magnetic field for the
+    per-arrow and quiver versions
+    """
+    def bench_mag_field(self,N_list=(10,100,1000),fmts=('png',)):
+        runs=[(False,10)]+[(True,N) for N in N_list]
+        for (quiver,N) in runs:
+            def build():
+                self.init()
+                self.ax.set_axis_off()
+                self.mag_field(2,quiver,N)
+                return self.fig
+            bench.figure(('quiver' if quiver else 'arrow').ljust(8)+
+                         str(N).rjust(6),build,fmts)
+
     """
     Cutaway function
     
@@ -164,61 +396,87 @@ class nstar_plot:
     r = a b / sqrt( (b*cos(t))^2 + (a*sin(t))^2 )
     where a is the radius in the x direction and b is the radius in
     the y direction.
+
+    N2 is the number of points per arc. The arcs are computed by
+    cutaway_arcs() and reused for repeated calls with the same
+    factor and N2.
+
+    The three arcs are drawn as one compound path rather than three
+    separate fills, so that antialiasing in raster backends like Agg
+    does not leave faint seams where the arcs meet.
+    """
+    def cutaway(self,factor,cname,ord,N2=100):
+        polys=[]
+        for (x,bot_y,top_y) in self.cutaway_arcs(factor,N2):
+            # The last vertex is replaced by CLOSEPOLY, so the first
+            # point is repeated at the end
+            polys.append(Path(numpy.concatenate(
+                (numpy.column_stack((x,top_y)),
+                 numpy.column_stack((x[::-1],bot_y[::-1])),
+                 [[x[0],top_y[0]]])),closed=True))
+        patch=PathPatch(Path.make_compound_path(*polys),facecolor=cname,
+                        lw=0,zorder=ord)
+        self.ax.add_patch(patch)
+
+    """
+    Compute the x coordinates and the bottom and top y coordinates of
+    the three cutaway arcs, or return them from cutaway_cache
     """
-    def cutaway(self,factor,cname,ord):
-        # Number of points per arc
-        N2=100
+    def cutaway_arcs(self,factor,N2=100):
+        key=(factor,N2)
+        if key in self.cutaway_cache:
+            return self.cutaway_cache[key]
+        pi=self.pi
+        frac=numpy.arange(0,N2)/float(N2-1)
+
         # Upper left part, from pi/2 to pi
-        x=[]
-        top_y=[]
-        bot_y=[]
         ell_b=0.3*factor
         ell_a=0.1*factor
-        for i in range(0,N2):
-            angle=self.pi-float(i)/(N2-1)*(self.pi/2.0)
-            r=ell_a*ell_b/sqrt((ell_b*cos(angle))**2+(ell_a*sin(angle))**2)
-            x.append(0.5+r*cos(angle))
-            top_y.append(0.5+r*sin(angle))
-            if angle>self.pi*3.0/4.0:
-                angle2=2*self.pi-angle
-                bot_y.append(0.5+r*sin(angle2))
-            else:
-                bot_y.append(0.5+r*cos(angle))
-        self.ax.fill_between(x,bot_y,top_y,facecolor=cname,lw=0,zorder=ord)
+        angle=pi-frac*(pi/2.0)
+        r=ell_a*ell_b/numpy.sqrt((ell_b*numpy.cos(angle))**2+
+                                 (ell_a*numpy.sin(angle))**2)
+        x1=0.5+r*numpy.cos(angle)
+        top_y1=0.5+r*numpy.sin(angle)
+        bot_y1=numpy.where(angle>pi*3.0/4.0,
+                           0.5+r*numpy.sin(2*pi-angle),
+                           0.5+r*numpy.cos(angle))
 
         # Upper right part, from 0 to pi/2
-        x=[]
-        top_y=[]
-        bot_y=[]
         ell_b=0.3*factor
         ell_a=0.2*factor
-        for i in range(0,N2):
-            angle=self.pi/2-float(i)/(N2-1)*(self.pi/2)
-            r=ell_a*ell_b/sqrt((ell_b*cos(angle))**2+(ell_a*sin(angle))**2)
-            x.append(0.5+r*cos(angle))
-            top_y.append(0.5+r*sin(angle))
-            if angle>self.pi/8.0:
-                bot_y.append(0.5-r*cos(angle)/4*1.5)
-            else:
-                bot_y.append(0.5+r*sin(-angle))
-        self.ax.fill_between(x,bot_y,top_y,facecolor=cname,lw=0,zorder=ord)
+        angle=pi/2-frac*(pi/2)
+        r=ell_a*ell_b/numpy.sqrt((ell_b*numpy.cos(angle))**2+
+                                 (ell_a*numpy.sin(angle))**2)
+        x2=0.5+r*numpy.cos(angle)
+        top_y2=0.5+r*numpy.sin(angle)
+        bot_y2=numpy.where(angle>pi/8.0,
+                           0.5-r*numpy.cos(angle)/4*1.5,
+                           0.5+r*numpy.sin(-angle))
 
         # Lower part, from 5*pi/4 to 15*pi/8
-        x=[]
-        top_y=[]
-        bot_y=[]
         ell_b=0.1*factor
         ell_a=0.3*factor
-        for i in range(0,N2):
-            angle=5*self.pi/4+float(i)/(N2-1)*(5.02*self.pi/8)
-            r=ell_a*ell_b/sqrt((ell_b*cos(angle))**2+(ell_a*sin(angle))**2)
-            x.append(0.5+r*cos(angle))
-            bot_y.append(0.5+r*sin(angle))
-            if angle>3*self.pi/2:
-                top_y.append(0.5-r*cos(angle)/4*1.5)
-            else:
-                top_y.append(0.5+r*cos(angle))
-        self.ax.fill_between(x,bot_y,top_y,facecolor=cname,lw=0,zorder=ord)
+        angle=5*pi/4+frac*(5.02*pi/8)
+        r=ell_a*ell_b/numpy.sqrt((ell_b*numpy.cos(angle))**2+
+                                 (ell_a*numpy.sin(angle))**2)
+        x3=0.5+r*numpy.cos(angle)
+        bot_y3=0.5+r*numpy.sin(angle)
+        top_y3=numpy.where(angle>3*pi/2,
+                           0.5-r*numpy.cos(angle)/4*1.5,
+                           0.5+r*numpy.cos(angle))
+
+        arcs=((x1,bot_y1,top_y1),(x2,bot_y2,top_y2),(x3,bot_y3,top_y3))
+        self.cutaway_cache[key]=arcs
+        return arcs
+
+    """
+    The four nested cutaways, from the atmosphere to the inner core
+    """
+    def cutaways(self,N2=100):
+        self.cutaway(1.0,self.atmos_color,5,N2)
+        self.cutaway(0.98,self.crust_color,6,N2)
+        self.cutaway(0.9,self.core_color,7,N2)
+        self.cutaway(0.5,self.inner_color,8,N2)
 
     """
     Arrows and label for rotation
@@ -297,8 +555,11 @@ class nstar_plot:
 
     """
     Box showing crust
+
+    If batched is True, the nuclei and pasta are drawn by
+    crust_nuclei() instead of crust_nuclei_ellipse().
     """
-    def crust_box(self,ord):
+    def crust_box(self,ord,batched=False,n_nuclei=230,seed=None):
         # Dashed lines to show zoom
         plot.plot([0.01,0.408],[0.31,0.5],color='white',
                   ls='--',lw=1.5,zorder=ord)
@@ -317,6 +578,52 @@ class nstar_plot:
         box_bkgd4=Rectangle((0.21,0.01),0.2,0.3,zorder=ord,lw=0)
         box_bkgd4.set_facecolor(self.neutron_color)
         self.ax.add_artist(box_bkgd4)
+        if batched:
+            self.crust_nuclei(ord,n_nuclei,seed)
+        else:
+            self.crust_nuclei_ellipse(ord)
+        # Labels
+        self.ax.text(0.05,0.12,'Outer',fontsize=20,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.crust_color,lw=0))
+        self.ax.text(0.09,0.12,'Crust',fontsize=20,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.crust_color,lw=0))
+        self.ax.text(0.21,0.12,'neutron drip',fontsize=16,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.crust_color,lw=0))
+        self.ax.text(0.25,0.12,'Inner',fontsize=20,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.neutron_color,lw=0))
+        self.ax.text(0.29,0.12,'Crust',fontsize=20,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.neutron_color,lw=0))
+        self.ax.text(0.38,0.12,'Pasta',fontsize=20,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.core_color,lw=0))
+        self.ax.text(0.45,0.12,'Core',fontsize=20,color='black',
+                     rotation=90,va='center',ha='center',zorder=ord+2)
+        # Density labels
+        self.ax.text(0.08,0.24,'g/cm$^{3}$:',fontsize=20,color='black',
+                     va='bottom',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.crust_color,lw=0))
+        self.ax.text(0.18,0.25,'$10^{11}$',fontsize=20,color='black',
+                     va='bottom',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.crust_color,lw=0))
+        self.ax.text(0.39,0.25,'$10^{14}$',fontsize=20,color='black',
+                     va='bottom',ha='center',zorder=ord+2,
+                     bbox=dict(facecolor=self.core_color,lw=0))
+        # Crust thickness label
+        self.ax.text(0.26,0.335,
+                     '$R_{\mathrm{crust}}=0.4-2.0~\mathrm{km}$',
+                     fontsize=20,color='white',
+                     va='center',ha='center',zorder=13,
+                     bbox=dict(facecolor=self.bkgd_color,lw=0))
+
+    """
+    Nuclei and pasta for the crust box, one Ellipse at a time
+    """
+    def crust_nuclei_ellipse(self,ord):
         # Nuclei
         for j in range(0,20):
             shift=rand()*0.02
@@ -348,76 +655,120 @@ class nstar_plot:
                            0.01,0.06,angle=rand()*60-30,zorder=ord+1,lw=0)
             pasta2.set_facecolor(self.core_color)
             self.ax.add_artist(pasta2)
-        # Labels
-        self.ax.text(0.05,0.12,'Outer',fontsize=20,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.crust_color,lw=0))
-        self.ax.text(0.09,0.12,'Crust',fontsize=20,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.crust_color,lw=0))
-        self.ax.text(0.21,0.12,'neutron drip',fontsize=16,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.crust_color,lw=0))
-        self.ax.text(0.25,0.12,'Inner',fontsize=20,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.neutron_color,lw=0))
-        self.ax.text(0.29,0.12,'Crust',fontsize=20,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.neutron_color,lw=0))
-        self.ax.text(0.38,0.12,'Pasta',fontsize=20,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.core_color,lw=0))
-        self.ax.text(0.45,0.12,'Core',fontsize=20,color='black',
-                     rotation='90',va='center',ha='center',zorder=ord+2)
-        # Density labels
-        self.ax.text(0.08,0.24,'g/cm$^{3}$:',fontsize=20,color='black',
-                     va='bottom',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.crust_color,lw=0))
-        self.ax.text(0.18,0.25,'$10^{11}$',fontsize=20,color='black',
-                     va='bottom',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.crust_color,lw=0))
-        self.ax.text(0.39,0.25,'$10^{14}$',fontsize=20,color='black',
-                     va='bottom',ha='center',zorder=ord+2,
-                     bbox=dict(facecolor=self.core_color,lw=0))
-        # Crust thickness label
-        self.ax.text(0.26,0.335,
-                     '$R_{\mathrm{crust}}=0.4-2.0~\mathrm{km}$',
-                     fontsize=20,color='white',
-                     va='center',ha='center',zorder=13,
-                     bbox=dict(facecolor=self.bkgd_color,lw=0))
+
+    """
+    Nuclei and pasta for the crust box, drawn as one EllipseCollection
+
+    The positions, sizes and angles are generated as arrays from a
+    seeded generator. The layout follows crust_box(): 20 columns of
+    nuclei with j+2 nuclei in column j, for 230 in total, and 80
+    pasta shapes near the core. For other values of n_nuclei the
+    number of columns is scaled by sqrt(n_nuclei/230), the sizes by
+    its inverse, and the nuclei are divided among the columns by
+    nuclei_counts(), so that there are exactly n_nuclei nuclei.
+    """
+    def crust_nuclei(self,ord,n_nuclei=230,seed=None):
+        rng=numpy.random.default_rng(seed)
+        scale=sqrt(float(n_nuclei)/230.0)
+        # Nuclei
+        counts=self.nuclei_counts(n_nuclei)
+        n_col=len(counts)
+        j=numpy.arange(n_col)
+        col=numpy.repeat(j,counts)
+        i=numpy.arange(len(col))-numpy.repeat(numpy.cumsum(counts)-counts,
+                                              counts)
+        shift=(rng.random(n_col)*0.02/scale+
+               (j%2==0)*0.15/numpy.maximum(counts,1))
+        nuc_x=0.02+0.38*col/max(n_col-1,1)
+        nuc_y=numpy.minimum(0.3*i/counts[col]+0.01+shift[col],0.30)
+        # Pasta
+        n_pasta=max(int(round(60*scale)),1)
+        pasta1_x=0.40-0.1*rng.random(n_pasta)*rng.random(n_pasta)
+        pasta1_y=numpy.maximum(0.3*numpy.arange(n_pasta)/n_pasta,0.03)
+        pasta1_ang=rng.random(n_pasta)*360
+        # Thinner pasta
+        n_pasta2=max(int(round(20*scale)),1)
+        pasta2_x=0.415-0.04*rng.random(n_pasta2)*rng.random(n_pasta2)
+        pasta2_y=numpy.maximum(0.3*numpy.arange(n_pasta2)/n_pasta2,0.04)
+        pasta2_ang=rng.random(n_pasta2)*60-30
+        x=numpy.concatenate((nuc_x,pasta1_x,pasta2_x))
+        y=numpy.concatenate((nuc_y,pasta1_y,pasta2_y))
+        widths=numpy.full(len(x),0.01/scale)
+        heights=numpy.concatenate((numpy.full(len(col),0.01/scale),
+                                   numpy.full(n_pasta,0.04/scale),
+                                   numpy.full(n_pasta2,0.06/scale)))
+        angles=numpy.concatenate((numpy.zeros(len(col)),pasta1_ang,
+                                  pasta2_ang))
+        coll=EllipseCollection(widths,heights,angles,units='xy',
+                               offsets=numpy.column_stack((x,y)),
+                               offset_transform=self.ax.transData,
+                               facecolors=[self.core_color],lw=0,
+                               zorder=ord+1)
+        self.ax.add_collection(coll,autolim=False)
+
+    """
+    Return the number of nuclei in each column of crust_nuclei().
+    There are round(20*scale) columns, with scale=sqrt(n_nuclei/230),
+    and column j gets a share of the n_nuclei nuclei proportional to
+    j/scale+2, so the columns fill up towards the core as in
+    crust_box(). The shares are rounded from their cumulative sums,
+    so the counts add up to n_nuclei, and for 230 nuclei they are
+    exactly j+2.
+    """
+    def nuclei_counts(self,n_nuclei):
+        scale=sqrt(float(n_nuclei)/230.0)
+        n_col=max(int(round(20*scale)),1)
+        weights=numpy.arange(n_col)/scale+2.0
+        cum=numpy.rint(n_nuclei*numpy.cumsum(weights)/numpy.sum(weights))
+        return numpy.diff(numpy.concatenate(([0],cum.astype(int))))
+
+    # Check that crust_nuclei() draws n nuclei for each n in n_list
+    def check_crust_nuclei(self,n_list=(1,23,230,2300,23000,230000)):
+        for n in n_list:
+            counts=self.nuclei_counts(n)
+            if numpy.sum(counts)!=n or numpy.any(counts<0):
+                raise RuntimeError('Crust box has '+str(numpy.sum(counts))+
+                                   ' nuclei instead of '+str(n)+'.')
+        if not numpy.array_equal(self.nuclei_counts(230),
+                                 numpy.arange(20)+2):
+            raise RuntimeError('Crust box layout differs from crust_box().')
+
+    """
+    Compare the time to draw and save the crust box nuclei for the
+    per-ellipse and batched versions
+    """
+    def bench_crust_nuclei(self,n_list=(230,2300,23000),fmts=('png',)):
+        runs=[('ellipse',230)]+[('batched',n) for n in n_list]
+        for (mode,n) in runs:
+            def build():
+                self.init()
+                self.ax.set_axis_off()
+                if mode=='batched':
+                    self.crust_nuclei(10,n,0)
+                else:
+                    self.crust_nuclei_ellipse(10)
+                return self.fig
+            bench.figure(mode.ljust(8)+str(n).rjust(7),build,fmts)
 
     """
     Box for various properties
     """
     def mass_limits(self,ord):
-        self.ax.text(0.58,0.225,
-                     (r'$\lambda=(0.2-6){\times}10^{36}~'+
-                      r'\mathrm{g}~\mathrm{cm}^2~\mathrm{s}^2$'),
-                     fontsize=20,color=self.text_color,va='center',
-                     ha='left',zorder=ord,
-                     bbox=dict(facecolor=self.bkgd_color,lw=0))
-        self.ax.text(0.58,0.175,
-                     r'$I=50-200~\mathrm{M}_{\odot}~\mathrm{km}^2$',
-                     fontsize=20,color=self.text_color,va='center',
-                     ha='left',zorder=ord,
-                     bbox=dict(facecolor=self.bkgd_color,lw=0))
-        self.ax.text(0.58,0.125,(r'$\varepsilon_{\mathrm{core}}='+
-                                 r'500-1600~\mathrm{MeV}/\mathrm{fm}^{3}$'),
-                     fontsize=20,color=self.text_color,va='center',
-                     ha='left',zorder=ord,
-                     bbox=dict(facecolor=self.bkgd_color,lw=0))
-        self.ax.text(0.58,0.075,(r'$n_{B,\mathrm{max}}='+
-                                 r'0.6-1.3~\mathrm{fm}^{-3}$'),
-                     fontsize=20,color=self.text_color,va='center',
-                     ha='left',zorder=ord,
-                     bbox=dict(facecolor=self.bkgd_color,lw=0))
-        self.ax.text(0.58,0.025,
-                     (r'$M_{\mathrm{min}}{\approx}1\mathrm{M}_{\odot}$ ;'+
-                      r' $M_{\mathrm{max}}>2\mathrm{M}_{\odot}$'),
-                     fontsize=20,color=self.text_color,va='center',
-                     ha='left',zorder=ord,
-                     bbox=dict(facecolor=self.bkgd_color,lw=0))
-            
+        for (i,text) in enumerate(self.mass_limits_text):
+            self.ax.text(0.58,0.225-0.05*i,text,
+                         fontsize=20,color=self.text_color,va='center',
+                         ha='left',zorder=ord,
+                         bbox=dict(facecolor=self.bkgd_color,lw=0))
+
+    """
+    Replace the text for mass_limits() with the ranges computed by
+    mass_limits.py from the EOS tables in the files 'fnames'
+    """
+    def compute_mass_limits(self,fnames,eos_prefix='full_eos'):
+        import mass_limits
+        self.mass_limits_text=mass_limits.mass_limits().run(fnames,
+                                                            eos_prefix)
+
     """
     Plot title on upper left
     """
@@ -427,6 +778,56 @@ class nstar_plot:
                      va='center',ha='left',zorder=ord,
                      bbox=dict(facecolor=self.bkgd_color,lw=0))
 
+    """
+    Save the current figure as basename+'.'+fmt for each format in
+    fmts, all from the same drawn figure and without leaving the
+    Python process, and print the time taken by each format
+
+    The .png output used to be made with imagemagick from the .eps
+    file because the cutaway fills did not render properly with some
+    backends. cutaway() now draws each cutaway as a single path, so
+    the .png is rendered directly by Agg. The labels are rendered
+    first by tex_labels.prepare().
+    """
+    def export(self,basename,fmts=('eps','pdf','svg','png'),dpi=None):
+        times={}
+        times['labels']=bench.timed(tex_labels.prepare,self.fig,dpi)[1]
+        print('Prepared labels in '+bench.fmt_time(times['labels'],4)+'.')
+        for fmt in fmts:
+            times[fmt]=bench.timed(self.fig.savefig,basename+'.'+fmt,
+                                   dpi=dpi)[1]
+            print('Wrote '+basename+'.'+fmt+' in '+
+                  bench.fmt_time(times[fmt],4)+'.')
+        return times
+
+    # Layers added at each stage of the staged version of the plot,
+    # given as a method name followed by its arguments
+    stages=[[('bkgd',),('base_star',),('title',15)],
+            [('cutaways',)],
+            [('cutaway_axes',9)],
+            [('cut_labels',9)],
+            [('crust_box',10)],
+            [('mag_field',2),('rotation',2)]]
+
+    """
+    Staged version of the plot
+
+    The layers of each stage are added to the same figure, which is
+    saved after each stage as prefix+'1.'+ext, prefix+'2.'+ext, and
+    so on. Each layer is thus built only once, and the zorder values
+    keep later layers, like the magnetic field, in the same place as
+    in run().
+    """
+    def run_staged(self,stages=None,prefix='nstar_plot_stage',ext='eps'):
+        if stages is None:
+            stages=self.stages
+        self.init()
+        for i in range(0,len(stages)):
+            for layer in stages[i]:
+                getattr(self,layer[0])(*layer[1:])
+            tex_labels.prepare(self.fig)
+            plot.savefig(prefix+str(i+1)+'.'+ext)
+
     """ -------------------------------------------------------------------
     Main plotting function
     """
@@ -436,28 +837,20 @@ class nstar_plot:
         self.base_star()
         self.mag_field(2)
         self.rotation(2)
-        self.cutaway(1.0,self.atmos_color,5)
-        self.cutaway(0.98,self.crust_color,6)
-        self.cutaway(0.9,self.core_color,7)
-        self.cutaway(0.5,self.inner_color,8)
+        self.cutaways()
         self.cutaway_axes(9)
         self.cut_labels(9)
         self.crust_box(10)
         self.mass_limits(13)
         self.title(15)
         
-        plot.savefig('nstar_plot.eps')
-        """
-        Unfortunately the cutaway fills don't render properly on png
-        output for some backends, so I use imagemagick to make .png
-        instead.
-        """
-        os.system('convert nstar_plot.eps nstar_plot.png')
+        self.export('nstar_plot')
         plot.show()
 
 """ -------------------------------------------------------------------
 Create the plot
 """
 
-np=nstar_plot()
-np.run()
+if __name__=='__main__':
+    np=nstar_plot()
+    np.run()
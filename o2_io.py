@@ -0,0 +1,601 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Reading O2scl HDF5 (.o2) files.
+
+Objects in an .o2 file are HDF5 groups with an 'o2scl_type' dataset.
+Finding them requires a walk over the whole file, so the result is
+stored in an index which maps each object name to its type. The
+index is kept in memory for the most recently used files and in a
+sidecar file next to the .o2 file, and is rebuilt when the size or
+modification time of the .o2 file changes. Open file handles are
+kept in a pool and are closed when their file changes.
+
+Table columns are read whole, with one HDF5 read per column, or in
+chunks for tables which do not fit in memory. Unit conversions are
+applied to the resulting arrays using the factors in unit_factors.
+
+load_table() reads tables from a column cache next to each .o2 file
+instead. The cache is a flat file with a JSON header followed by the
+uncompressed columns, each aligned to cache_align bytes, and it is
+memory mapped so the columns are views of the file with no copying.
+The cache is filled column by column: a load which asks for columns
+that are not in the cache reads only those from the .o2 file and
+adds them to it. The cache is emptied when the size or modification
+time of the .o2 file changes. h5py is only imported when an .o2 file
+has to be read.
+"""
+
+import os
+import sys
+import json
+import threading
+import subprocess
+from collections import OrderedDict
+import numpy
+import bench
+
+# h5py is not imported until load_h5py() is called, so that reading
+# tables from the column cache does not pay for it
+h5py=None
+
+# Import h5py into the module namespace
+def load_h5py():
+    global h5py
+    if h5py is not None:
+        return
+    import h5py
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class o2_index:
+
+    # Maximum number of file indexes kept in memory
+    max_size=32
+    # Suffix for the sidecar index files, or None to disable them
+    sidecar_suffix='.index.json'
+
+    def __init__(self):
+        # In-memory indexes, in least- to most-recently-used order
+        self.indexes=OrderedDict()
+        # Open files, indexed by path
+        self.files={}
+        self.lock=threading.RLock()
+
+    # Return (modification time, size) for a file
+    def file_stamp(self,fname):
+        st=os.stat(fname)
+        return [st.st_mtime_ns,st.st_size]
+
+    """
+    Walk an open HDF5 file and return a dictionary which maps the
+    name of each O2scl object to its type
+    """
+    def build(self,f):
+        index={}
+        def visit(name,obj):
+            if isinstance(obj,h5py.Group) and 'o2scl_type' in obj:
+                otype=obj['o2scl_type'][0]
+                if isinstance(otype,bytes):
+                    otype=otype.decode('utf-8')
+                index[name]=otype
+        f.visititems(visit)
+        return index
+
+    # Read a sidecar index, returning None if it is missing or stale
+    def read_sidecar(self,fname,stamp):
+        if self.sidecar_suffix is None:
+            return None
+        try:
+            with open(fname+self.sidecar_suffix) as f:
+                dat=json.load(f)
+        except (IOError,ValueError):
+            return None
+        if dat.get('stamp')!=stamp:
+            return None
+        return dat['index']
+
+    # Write a sidecar index, ignoring read-only directories
+    def write_sidecar(self,fname,stamp,index):
+        if self.sidecar_suffix is None:
+            return
+        try:
+            with open(fname+self.sidecar_suffix,'w') as f:
+                json.dump({'stamp':stamp,'index':index},f,indent=1,
+                          sort_keys=True)
+        except IOError:
+            pass
+
+    """
+    Return an open, read-only h5py.File for fname from the pool. The
+    files are shared, so callers should not close them; use close()
+    instead.
+    """
+    def open(self,fname):
+        load_h5py()
+        path=os.path.abspath(fname)
+        with self.lock:
+            stamp=self.file_stamp(path)
+            if path in self.files:
+                (f,old_stamp)=self.files[path]
+                if old_stamp==stamp and f.id.valid:
+                    return f
+                f.close()
+            f=h5py.File(path,'r')
+            self.files[path]=(f,stamp)
+            return f
+
+    # Close one pooled file, or all of them if fname is None
+    def close(self,fname=None):
+        with self.lock:
+            if fname is None:
+                paths=list(self.files.keys())
+            else:
+                paths=[os.path.abspath(fname)]
+            for path in paths:
+                if path in self.files:
+                    self.files.pop(path)[0].close()
+
+    """
+    Return the index for fname, from memory, from the sidecar file,
+    or by walking the file, in that order
+    """
+    def index(self,fname):
+        path=os.path.abspath(fname)
+        with self.lock:
+            stamp=self.file_stamp(path)
+            if path in self.indexes:
+                (old_stamp,index)=self.indexes[path]
+                if old_stamp==stamp:
+                    self.indexes.move_to_end(path)
+                    return index
+            index=self.read_sidecar(path,stamp)
+            if index is None:
+                index=self.build(self.open(path))
+                self.write_sidecar(path,stamp,index)
+            self.indexes[path]=(stamp,index)
+            while len(self.indexes)>self.max_size:
+                self.indexes.popitem(last=False)
+            return index
+
+    # Return the type of object 'name' in fname, or None
+    def type_of(self,fname,name):
+        return self.index(fname).get(name)
+
+    # Return the names of all objects of type loc_type in fname
+    def names_of_type(self,fname,loc_type):
+        return sorted(k for (k,v) in self.index(fname).items()
+                      if v==loc_type)
+
+    """
+    Return the HDF5 group for the object of type loc_type named name
+    in fname, raising RuntimeError if there is no such object
+    """
+    def h5read_type_named(self,fname,loc_type,name):
+        if self.type_of(fname,name)!=loc_type:
+            raise RuntimeError('No object of type '+loc_type+' named '+
+                               name+' in file '+fname+'.')
+        return self.open(fname)[name]
+
+# Index shared by all users in this process
+default_index=o2_index()
+
+# Shorthand for default_index.h5read_type_named()
+def h5read_type_named(fname,loc_type,name):
+    return default_index.h5read_type_named(fname,loc_type,name)
+
+""" -------------------------------------------------------------------
+Tables
+"""
+
+# Multiplicative unit conversion factors, indexed by (from,to). The
+# inverse conversions are found automatically.
+unit_factors={
+    # hbar c in MeV fm
+    ('1/fm^4','MeV/fm^3'):197.33,
+    ('1/fm','MeV'):197.33,
+    # Geometrized units, G=c=1
+    ('1/fm^4','1/km^2'):197.33*1.3234e-6,
+    ('Msun','km'):1.4766,
+    # Mass density from baryon density, as used for the crust labels
+    ('1/fm^3','g/cm^3'):2.8e14/0.16,
+    ('km','m'):1.0e3,
+    ('fm','cm'):1.0e-13
+}
+
+"""
+Return the factor which converts from unit 'old' to unit 'new',
+raising RuntimeError if the conversion is not in unit_factors
+"""
+def unit_factor(old,new):
+    if old==new:
+        return 1.0
+    if (old,new) in unit_factors:
+        return unit_factors[(old,new)]
+    if (new,old) in unit_factors:
+        return 1.0/unit_factors[(new,old)]
+    raise RuntimeError('No conversion from '+old+' to '+new+'.')
+
+"""
+Read an O2scl string[] object, stored as one array of characters.
+O2scl writes only 'nw' for an empty array.
+"""
+def read_string_array(group):
+    if 'counter' not in group:
+        return []
+    counter=group['counter'][:]
+    chars=group['data'][:].tobytes().decode('utf-8')
+    ends=numpy.cumsum(counter)
+    return [chars[e-n:e] for (n,e) in zip(counter,ends)]
+
+# Write an O2scl string[] object
+def write_string_array(group,strings):
+    data=numpy.frombuffer(''.join(strings).encode('utf-8'),dtype='i1')
+    group.create_dataset('counter',data=numpy.array(
+        [len(x) for x in strings],dtype='i4'),maxshape=(None,))
+    group.create_dataset('data',data=data,maxshape=(None,))
+    group.create_dataset('nc',data=numpy.array([len(data)],dtype='i4'))
+    group.create_dataset('nw',data=numpy.array([len(strings)],dtype='i4'))
+    group.create_dataset('o2scl_type',data=numpy.array([b'string[]']))
+
+# Return the number of rows in an O2scl table
+def table_nlines(group):
+    return int(group['nlines'][0])
+
+"""
+Return a dictionary of the units of the columns of an O2scl table,
+which is empty if the table has no units
+"""
+def table_units(group):
+    if 'unit_flag' not in group or group['unit_flag'][0]==0:
+        return {}
+    names=read_string_array(group['col_names'])
+    units=read_string_array(group['units'])
+    return dict((n,u) for (n,u) in zip(names,units) if u!='')
+
+# Return a dictionary of the constants of an O2scl table
+def table_constants(group):
+    if 'con_names' not in group:
+        return {}
+    names=read_string_array(group['con_names'])
+    return dict(zip(names,(float(x) for x in group['con_values'][:])))
+
+# Return the conversion factor for column 'col' given 'convert'
+def column_factor(col,convert,units):
+    if convert is None or col not in convert:
+        return 1.0
+    conv=convert[col]
+    if isinstance(conv,str):
+        if col not in units:
+            raise RuntimeError('Column '+col+' has no unit to convert.')
+        conv=(units[col],conv)
+    return unit_factor(conv[0],conv[1])
+
+"""
+Read the columns 'cols' of the O2scl table in 'group' into a
+dictionary of numpy arrays, with one HDF5 read per column.
+
+'convert' optionally maps column names to a unit conversion, given
+either as a pair (from,to) or as a target unit, in which case the
+unit stored in the table is converted from.
+"""
+def read_columns(group,cols,convert=None):
+    n=table_nlines(group)
+    units=table_units(group)
+    ret={}
+    for col in cols:
+        fact=column_factor(col,convert,units)
+        arr=group['data/'+col][0:n]
+        if fact!=1.0:
+            # Not in place, so integer columns are converted to floats
+            arr=arr*fact
+        ret[col]=arr
+    return ret
+
+"""
+Iterate over the table in 'group' in chunks of at most chunk_size
+rows, yielding a dictionary of arrays as in read_columns(), so that
+tables larger than the available memory can be processed
+"""
+def iter_columns(group,cols,convert=None,chunk_size=1000000):
+    n=table_nlines(group)
+    units=table_units(group)
+    facts=dict((col,column_factor(col,convert,units)) for col in cols)
+    for start in range(0,n,chunk_size):
+        end=min(start+chunk_size,n)
+        ret={}
+        for col in cols:
+            arr=group['data/'+col][start:end]
+            if facts[col]!=1.0:
+                arr=arr*facts[col]
+            ret[col]=arr
+        yield ret
+
+"""
+Write a table in the O2scl format as object 'name' in file 'fname',
+creating the file if necessary. 'columns' is a list of
+(name,array) pairs, 'units' an optional dictionary of column
+units and 'constants' an optional dictionary of table constants.
+"""
+def write_table(fname,name,columns,units=None,constants=None):
+    load_h5py()
+    with h5py.File(fname,'a') as f:
+        if name in f:
+            del f[name]
+        g=f.create_group(name)
+        names=[c[0] for c in columns]
+        n=len(columns[0][1]) if len(columns)>0 else 0
+        write_string_array(g.create_group('col_names'),names)
+        if constants is None:
+            constants={}
+        con_names=sorted(constants)
+        write_string_array(g.create_group('con_names'),con_names)
+        g.create_dataset('con_values',data=numpy.array(
+            [constants[c] for c in con_names],dtype='f8'),maxshape=(None,))
+        d=g.create_group('data')
+        for (col,arr) in columns:
+            d.create_dataset(col,data=numpy.asarray(arr,dtype='f8'),
+                             maxshape=(None,))
+        g.create_dataset('itype',data=numpy.array([2],dtype='u8'))
+        g.create_dataset('nlines',data=numpy.array([n],dtype='i4'))
+        g.create_dataset('o2scl_type',data=numpy.array([b'table']))
+        if units:
+            write_string_array(g.create_group('units'),
+                               [units.get(c,'') for c in names])
+            g.create_dataset('unit_flag',data=numpy.array([1],dtype='i4'))
+        else:
+            g.create_dataset('unit_flag',data=numpy.array([0],dtype='i4'))
+
+"""
+Append the rows in 'columns', a list of (name,array) pairs with
+the same column names as write_table() was given, to table 'name'
+in file 'fname', so a large table can be written in chunks
+"""
+def append_table(fname,name,columns):
+    load_h5py()
+    with h5py.File(fname,'a') as f:
+        g=f[name]
+        n=table_nlines(g)
+        m=len(columns[0][1])
+        for (col,arr) in columns:
+            dset=g['data/'+col]
+            dset.resize((n+m,))
+            dset[n:n+m]=arr
+        g['nlines'][0]=n+m
+
+"""
+Compare reading and converting the 'ed' and 'pr' columns of an
+n-row full_eos table element by element, as eos_mvsr.py used to,
+with read_columns() and iter_columns(). The element by element read
+is timed on the first n_slow rows and scaled to n rows.
+"""
+def bench_read_columns(fname='bench_eos.o2',n=1000000,n_slow=10000):
+    ed=numpy.linspace(0.1,10.0,n)
+    write_table(fname,'full_eos',[('ed',ed),('pr',ed**2/3.0)],
+                {'ed':'1/fm^4','pr':'1/fm^4'})
+    load_h5py()
+    f=h5py.File(fname,'r')
+    dset=f['full_eos']
+    def slow():
+        ed2=[dset['data/ed'][i]*197.33 for i in range(0,n_slow)]
+        pr2=[dset['data/pr'][i]*197.33 for i in range(0,n_slow)]
+    def chunked():
+        total=0.0
+        for chunk in iter_columns(dset,['ed','pr'],{'ed':'MeV/fm^3',
+                                                   'pr':'MeV/fm^3'},100000):
+            total+=numpy.sum(chunk['pr'])
+    t_slow=bench.timed(slow)[1]*n/n_slow
+    bench.report('Element by element:',[('estimated',t_slow)])
+    t_fast=bench.timed(read_columns,dset,['ed','pr'],
+                       {'ed':'MeV/fm^3','pr':'MeV/fm^3'})[1]
+    bench.report('read_columns():    ',[('time',t_fast)])
+    t_chunk=bench.timed(chunked)[1]
+    bench.report('iter_columns():    ',[('time',t_chunk)])
+    f.close()
+    os.remove(fname)
+    return (t_slow,t_fast,t_chunk)
+
+"""
+Check that read_columns(), iter_columns() and load_table() convert
+an integer column to floating point, using a table written to fname
+"""
+def check_integer_column(fname='check_int.o2'):
+    write_table(fname,'tab',[('r',numpy.zeros(5))],{'r':'km'})
+    load_h5py()
+    with h5py.File(fname,'a') as f:
+        del f['tab/data/r']
+        f['tab/data'].create_dataset('r',data=numpy.arange(5,dtype='i4'))
+    expected=numpy.arange(5)*unit_factor('km','m')
+    try:
+        with h5py.File(fname,'r') as f:
+            results=[read_columns(f['tab'],['r'],{'r':'m'})['r'],
+                     next(iter_columns(f['tab'],['r'],{'r':'m'}))['r']]
+        results.append(load_table(fname,'tab',['r'],{'r':'m'})['r'])
+    finally:
+        default_index.close(fname)
+        for x in [fname,cache_name(fname,'tab'),
+                  fname+str(default_index.sidecar_suffix)]:
+            if os.path.isfile(x):
+                os.remove(x)
+    for arr in results:
+        if arr.dtype.kind!='f' or not numpy.allclose(arr,expected):
+            raise RuntimeError('Integer column converted to '+str(arr)+
+                               ' instead of '+str(expected)+'.')
+
+""" -------------------------------------------------------------------
+Column cache
+"""
+
+# First bytes of a column cache file, including the format version
+cache_magic=b'O2COLS02'
+# Alignment of the header and of each column in the cache, in bytes
+cache_align=64
+
+# Return the name of the column cache file for table 'name' in fname
+def cache_name(fname,name):
+    return fname+'.'+name.replace('/','.')+'.cols'
+
+"""
+Write the (name,array) pairs in 'columns' with the given stamp and
+units to the column cache file cname. 'names' is the list of all
+columns of the source table, by default those in 'columns'. The file
+is written under a temporary name and then renamed, so readers never
+see a partial cache.
+"""
+def write_cache_columns(cname,stamp,units,columns,names=None):
+    if names is None:
+        names=[col for (col,arr) in columns]
+    header={'stamp':stamp,'units':units,'names':names,'columns':[]}
+    columns=[(col,numpy.ascontiguousarray(arr)) for (col,arr) in columns]
+    # Offsets are relative to the end of the header
+    offset=0
+    for (col,arr) in columns:
+        header['columns'].append([col,arr.dtype.str,len(arr),offset])
+        offset+=-(-arr.nbytes//cache_align)*cache_align
+    text=json.dumps(header).encode('utf-8')
+    size=-(-(len(cache_magic)+8+len(text))//cache_align)*cache_align
+    tmp=cname+'.'+str(os.getpid())+'.tmp'
+    with open(tmp,'wb') as f:
+        f.write(cache_magic)
+        f.write(numpy.array([size],dtype='<u8').tobytes())
+        f.write(text)
+        f.write(b' '*(size-len(cache_magic)-8-len(text)))
+        for (col,arr) in columns:
+            f.write(arr.tobytes())
+            f.write(b'\0'*(-arr.nbytes%cache_align))
+    os.replace(tmp,cname)
+
+"""
+Read the columns 'cols' (all columns if None) of table 'name' in
+fname which are not in 'data', the columns of the cache cname, and
+rewrite the cache with both. Returns the columns which were read,
+the units and the names of all columns of the table. If the cache
+cannot be written, the columns are returned all the same.
+"""
+def update_cache(fname,name,cname,stamp,data,cols=None):
+    tab=h5read_type_named(fname,'table',name)
+    names=read_string_array(tab['col_names'])
+    if cols is None:
+        cols=names
+    new=read_columns(tab,[c for c in cols if c not in data])
+    units=table_units(tab)
+    try:
+        write_cache_columns(cname,stamp,units,list(data.items())+
+                            list(new.items()),names)
+    except IOError:
+        pass
+    return (new,units,names)
+
+"""
+Memory map the column cache file cname and return its header and a
+dictionary of read-only arrays which are views of the file, or
+(None,None) if it is missing or not a column cache
+"""
+def read_cache(cname):
+    try:
+        mm=numpy.memmap(cname,dtype='u1',mode='r')
+    except (IOError,ValueError):
+        return (None,None)
+    if len(mm)<16 or mm[0:8].tobytes()!=cache_magic:
+        return (None,None)
+    size=int(mm[8:16].view('<u8')[0])
+    header=json.loads(mm[16:size].tobytes().decode('utf-8'))
+    ret={}
+    for (col,dtype,n,offset) in header['columns']:
+        ret[col]=numpy.frombuffer(mm,dtype=dtype,count=n,
+                                  offset=size+offset)
+    return (header,ret)
+
+"""
+Return the columns 'cols' (all columns if None) of table 'name' in
+fname from the column cache. Columns which are not in the cache, or
+all columns if the cache is missing or older than fname, are read
+from fname and added to the cache first, so a cold load reads only
+the columns it returns. Columns without a unit conversion in
+'convert' (see read_columns()) are read-only views of the cache,
+unless the cache cannot be written.
+"""
+def load_table(fname,name,cols=None,convert=None):
+    cname=cache_name(fname,name)
+    stamp=default_index.file_stamp(fname)
+    (header,data)=read_cache(cname)
+    if header is None or header['stamp']!=stamp:
+        (header,data)=(None,{})
+    if (header is None or
+        any(c not in data for c in (header['names'] if cols is None
+                                     else cols))):
+        (new,units,names)=update_cache(fname,name,cname,stamp,data,cols)
+        (header,cached)=read_cache(cname)
+        if (header is None or header['stamp']!=stamp or
+            any(c not in cached for c in new)):
+            # The cache could not be written
+            header={'units':units,'names':names}
+            cached=dict(data,**new)
+        data=cached
+    if cols is None:
+        cols=header['names']
+    ret={}
+    for col in cols:
+        fact=column_factor(col,convert,header['units'])
+        ret[col]=data[col] if fact==1.0 else data[col]*fact
+    return ret
+
+"""
+Compare the time to load every column of table 'name' in fname with
+h5py and read_columns() and with load_table(), both with no cache
+(cold, which includes writing the cache) and with a cache (warm).
+Each is timed in this process and in a new Python process, which
+includes the imports.
+"""
+def bench_load_table(fname,name,n_runs=5):
+    fname=os.path.abspath(fname)
+    cname=cache_name(fname,name)
+    code_h5=('import o2_io; import h5py; f=h5py.File('+repr(fname)+
+             ',"r"); t=f['+repr(name)+']; '+
+             'c=o2_io.read_columns(t,o2_io.read_string_array('+
+             't["col_names"]))')
+    code_cache=('import o2_io; c=o2_io.load_table('+repr(fname)+','+
+                repr(name)+')')
+    # Directory of this module, for the new processes
+    here=os.path.dirname(os.path.abspath(__file__))
+    # Average time of n_runs calls to func()
+    def run(func,cold):
+        dt=0.0
+        for i in range(0,n_runs):
+            if cold and os.path.isfile(cname):
+                os.remove(cname)
+            dt+=bench.timed(func)[1]
+        return dt/n_runs
+    def new_process(code):
+        return lambda: subprocess.check_call([sys.executable,'-c',code],
+                                             cwd=here)
+    def h5():
+        tab=h5read_type_named(fname,'table',name)
+        read_columns(tab,read_string_array(tab['col_names']))
+    def cache():
+        load_table(fname,name)
+    for (label,func,code,cold) in [('h5py',h5,code_h5,False),
+                                   ('cache, cold',cache,code_cache,True),
+                                   ('cache, warm',cache,code_cache,False)]:
+        bench.report(label.ljust(12),[('in process',run(func,cold)),
+                                      ('new process',
+                                       run(new_process(code),cold))],5)
@@ -23,7 +23,11 @@ along with this program. If not, see <http://www.gnu.org/licenses/>.
 -------------------------------------------------------------------
 
 """
-import matplotlib.pyplot as plot
+import tex_labels
+
+# Pyplot is not imported until the first figure is created, so that
+# importing this module is fast
+plot=None
 
 # Material, original time coordinate, original temperature coordinate,
 # from P.J. Ray at
@@ -99,234 +103,273 @@ dat=[
      [r'H$_2$S @ 155~GPa',9,203,7,1,1.25,1]
 ]
 
-# Initial figure setup
-
-lmar=0.14
-bmar=0.12
-rmar=0.04
-tmar=0.04
-
-plot.rc('text',usetex=True)
-plot.rc('font',family='serif')
-plot.rcParams['lines.linewidth']=0.5
-fig=plot.figure(1,figsize=(6.0,6.0))
-fig.set_facecolor('white')
-ax=plot.axes([lmar,bmar,1.0-lmar-rmar,1.0-tmar-bmar])
-ax.minorticks_on()
-ax.tick_params('both',length=12,width=1,which='major')
-ax.tick_params('both',length=5,width=1,which='minor')
-plot.grid(False)
-
-# First plot
-
-y_scale=1.25
-x_scale=1.0
-
-plot.xlim([1900,2040])
-plot.ylim([2.0e-1,4.0e2])
-        
-for i in range(0,len(dat)):
-    if dat[i][6]==0:
-        if dat[i][3]==1:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='blue',mew=0)
-        elif dat[i][3]==2:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='salmon',mew=0)
-        elif dat[i][3]==3:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='gold',mew=0)
-        elif dat[i][3]==4:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='cyan',mew=0)
-        elif dat[i][3]==5:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='dimgray',mew=0)
-        elif dat[i][3]==6:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='red',mew=0)
-        elif dat[i][3]==7:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='blue',mew=0)
-        if i<3:
-            ax.text(time(dat[i][1])*x_scale*dat[i][4],
-                    tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
-                    fontsize=12,va='center',ha='center',color='blue')
-
-ax.text(0.1,0.55,'BCS',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='blue')
-ax.text(0.55,0.25,'Heavy fermion',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='salmon')
-ax.text(0.53,0.85,'Cuprates',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='gold')
-ax.text(0.6,0.54,'Fullerenes',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='cyan')
-ax.text(0.86,0.1,'Carbon-based',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='dimgray')
-ax.text(0.88,0.7,'Iron-based',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='red')
-
-ax.text(0.5,-0.1,'Discovery year',
-        transform=ax.transAxes,
-        fontsize=12,va='center',ha='center')
-ax.text(-0.1,0.5,r'$T_C$ (K)',rotation=90,
-        transform=ax.transAxes,
-        fontsize=12,va='center',ha='center')
-plot.savefig('sfluid1.png')        
-#plot.show()
-
-plot.clf()
-
-# Second plot
-
-y_scale=1.0
-x_scale=1.0
-
-ax=plot.axes([lmar,bmar,1.0-lmar-rmar,1.0-tmar-bmar])
-ax.minorticks_on()
-ax.tick_params('both',length=12,width=1,which='major')
-ax.tick_params('both',length=5,width=1,which='minor')
-
-plot.xlim([1900,2040])
-plot.ylim([2.0e-1,4.0e2])
-
-for i in range(0,len(dat)):
-    if dat[i][6]==1:
-        if dat[i][3]==3:
-            ax.text(time(dat[i][1])*x_scale*dat[i][4],
-                    tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
-                    fontsize=12,va='center',ha='center',color='black')
-        elif dat[i][3]==4:
-            ax.text(time(dat[i][1])*x_scale*dat[i][4],
-                    tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
-                    fontsize=12,va='center',ha='center',color='black')
-        elif dat[i][3]==7:
-            ax.text(time(dat[i][1])*x_scale*dat[i][4],
-                    tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
-                    fontsize=12,va='center',ha='center',color='black')
-    if dat[i][3]==1:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='blue',mew=0)
-    elif dat[i][3]==2:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='salmon',mew=0)
-    elif dat[i][3]==3:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='gold',mew=0)
-    elif dat[i][3]==4:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='cyan',mew=0)
-    elif dat[i][3]==5:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='dimgray',mew=0)
-    elif dat[i][3]==6:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='red',mew=0)
-    elif dat[i][3]==7:
-        if i==len(dat)-1:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='none',mew=1,mec='blue')
-        else:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='blue',mew=0)
-
-ax.text(0.1,0.55,'BCS',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='blue')
-ax.text(0.55,0.25,'Heavy fermion',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='salmon')
-ax.text(0.53,0.85,'Cuprates',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='gold')
-ax.text(0.6,0.54,'Fullerenes',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='cyan')
-ax.text(0.86,0.1,'Carbon-based',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='dimgray')
-ax.text(0.88,0.7,'Iron-based',transform=ax.transAxes,
-        fontsize=12,va='center',ha='center',color='red')
-
-ax.text(0.5,-0.1,'Discovery year',
-        transform=ax.transAxes,
-        fontsize=12,va='center',ha='center')
-ax.text(-0.1,0.5,r'$T_C$ (K)',rotation=90,
-        transform=ax.transAxes,
-        fontsize=12,va='center',ha='center')
-
-plot.savefig('sfluid2.png')        
-#plot.show()
-
-plot.clf()
-
-# Third plot
-
-ax=plot.axes([lmar,bmar,1.0-lmar-rmar,1.0-tmar-bmar])
-ax.minorticks_on()
-ax.tick_params('both',length=12,width=1,which='major')
-ax.tick_params('both',length=5,width=1,which='minor')
-
-plot.xlim([1900,2040])
-plot.ylim([2.0e-1,4.0e11])
-
-for i in range(0,len(dat)):
-    if dat[i][3]==1:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='blue',mew=0)
-    elif dat[i][3]==2:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='salmon',mew=0)
-    elif dat[i][3]==3:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='gold',mew=0)
-    elif dat[i][3]==4:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='cyan',mew=0)
-    elif dat[i][3]==5:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='dimgray',mew=0)
-    elif dat[i][3]==6:
-        plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                      marker='o',mfc='red',mew=0)
-    elif dat[i][3]==7:
-        if i==len(dat)-1:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mec='blue',mew=1,mfc='none')
+""" -------------------------------------------------------------------
+Class definition
+"""
+class sfluid_plot:
+
+    # Margins
+    lmar=0.14
+    bmar=0.12
+    rmar=0.04
+    tmar=0.04
+    # Figure object
+    fig=0
+    # Axis object
+    ax=0
+
+    # Initial figure setup
+    def default_plot(self):
+        global plot
+        import matplotlib.pyplot as plot
+        tex_labels.setup(plot)
+        plot.rc('font',family='serif')
+        plot.rcParams['lines.linewidth']=0.5
+        self.fig=plot.figure(1,figsize=(6.0,6.0))
+        self.fig.set_facecolor('white')
+
+    """
+    Create the axes, clearing the figure from a previous plot or
+    creating it if necessary
+    """
+    def new_axes(self):
+        if self.fig==0:
+            self.default_plot()
         else:
-            plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
-                          marker='o',mfc='blue',mew=0)
-
-x_scale=1.004
-y_scale=1.0
-        
-plot.semilogy(2009,1.2e10,marker='o',mfc='green',mew=0)
-ax.text(2009*x_scale,1.2e10*y_scale,r'$^{1}S_0$ n',
-        fontsize=12,va='center',ha='center')
-plot.semilogy(2009,4.0e9,marker='o',mfc='green',mew=0)
-ax.text(2009*x_scale,4.0e9*y_scale,r'$^{1}S_0$ p',
-        fontsize=12,va='center',ha='center')
-plot.semilogy(2009,5.0e8,marker='o',mfc='green',mew=0)
-ax.text(2009*x_scale,5.0e8*y_scale,r'$^{3}P_2$ n',
-        fontsize=12,va='center',ha='center')
-plot.semilogy(1958,3.5e10,marker='o',mfc='green',mew=0)
-ax.text(1960*x_scale,3.0e10*y_scale,r'(Z,N)',
-        fontsize=12,va='center',ha='center')
-plot.semilogy(1977,1.6e10,marker='o',mec='purple',mfc='none',mew=1)
-ax.text(1977*x_scale,1.6e10*y_scale,r'uds',
-        fontsize=12,va='center',ha='center')
-
-ax.text(1965,7.5e10,'Bohr and Mottelson (1957)',
-        fontsize=12,va='center',ha='right')
-ax.text(2007,7.0e9,'Brown and Cumming (2009)',
-        fontsize=12,va='center',ha='right')
-ax.text(2007,3.4e10,'Barrois (1977)',
-        fontsize=12,va='center',ha='right')
-ax.text(2010,1.3e9,'Page et al. (2009)',
-        fontsize=12,va='center',ha='right')
-
-ax.text(0.5,-0.1,'Discovery year',
-        transform=ax.transAxes,
-        fontsize=12,va='center',ha='center')
-ax.text(-0.1,0.5,r'$T_C$ (K)',rotation=90,
-        transform=ax.transAxes,
-        fontsize=12,va='center',ha='center')
-
-plot.savefig('sfluid3.png')        
-#plot.show()
+            plot.clf()
+        lmar=self.lmar
+        bmar=self.bmar
+        rmar=self.rmar
+        tmar=self.tmar
+        self.ax=plot.axes([lmar,bmar,1.0-lmar-rmar,1.0-tmar-bmar])
+        self.ax.minorticks_on()
+        self.ax.tick_params('both',length=12,width=1,which='major')
+        self.ax.tick_params('both',length=5,width=1,which='minor')
+        return self.ax
+
+    # First plot
+    def plot1(self):
+        ax=self.new_axes()
+        plot.grid(False)
+        fig=self.fig
+
+        y_scale=1.25
+        x_scale=1.0
+
+        plot.xlim([1900,2040])
+        plot.ylim([2.0e-1,4.0e2])
+
+        for i in range(0,len(dat)):
+            if dat[i][6]==0:
+                if dat[i][3]==1:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='blue',mew=0)
+                elif dat[i][3]==2:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='salmon',mew=0)
+                elif dat[i][3]==3:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='gold',mew=0)
+                elif dat[i][3]==4:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='cyan',mew=0)
+                elif dat[i][3]==5:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='dimgray',mew=0)
+                elif dat[i][3]==6:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='red',mew=0)
+                elif dat[i][3]==7:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='blue',mew=0)
+                if i<3:
+                    ax.text(time(dat[i][1])*x_scale*dat[i][4],
+                            tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
+                            fontsize=12,va='center',ha='center',color='blue')
+
+        ax.text(0.1,0.55,'BCS',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='blue')
+        ax.text(0.55,0.25,'Heavy fermion',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='salmon')
+        ax.text(0.53,0.85,'Cuprates',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='gold')
+        ax.text(0.6,0.54,'Fullerenes',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='cyan')
+        ax.text(0.86,0.1,'Carbon-based',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='dimgray')
+        ax.text(0.88,0.7,'Iron-based',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='red')
+
+        ax.text(0.5,-0.1,'Discovery year',
+                transform=ax.transAxes,
+                fontsize=12,va='center',ha='center')
+        ax.text(-0.1,0.5,r'$T_C$ (K)',rotation=90,
+                transform=ax.transAxes,
+                fontsize=12,va='center',ha='center')
+        tex_labels.prepare(fig)
+        plot.savefig('sfluid1.png')
+        #plot.show()
+
+    # Second plot
+    def plot2(self):
+        ax=self.new_axes()
+        fig=self.fig
+
+        y_scale=1.0
+        x_scale=1.0
+
+        plot.xlim([1900,2040])
+        plot.ylim([2.0e-1,4.0e2])
+
+        for i in range(0,len(dat)):
+            if dat[i][6]==1:
+                if dat[i][3]==3:
+                    ax.text(time(dat[i][1])*x_scale*dat[i][4],
+                            tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
+                            fontsize=12,va='center',ha='center',color='black')
+                elif dat[i][3]==4:
+                    ax.text(time(dat[i][1])*x_scale*dat[i][4],
+                            tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
+                            fontsize=12,va='center',ha='center',color='black')
+                elif dat[i][3]==7:
+                    ax.text(time(dat[i][1])*x_scale*dat[i][4],
+                            tptr(dat[i][2])*y_scale*dat[i][5],dat[i][0],
+                            fontsize=12,va='center',ha='center',color='black')
+            if dat[i][3]==1:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='blue',mew=0)
+            elif dat[i][3]==2:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='salmon',mew=0)
+            elif dat[i][3]==3:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='gold',mew=0)
+            elif dat[i][3]==4:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='cyan',mew=0)
+            elif dat[i][3]==5:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='dimgray',mew=0)
+            elif dat[i][3]==6:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='red',mew=0)
+            elif dat[i][3]==7:
+                if i==len(dat)-1:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='none',mew=1,mec='blue')
+                else:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='blue',mew=0)
+
+        ax.text(0.1,0.55,'BCS',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='blue')
+        ax.text(0.55,0.25,'Heavy fermion',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='salmon')
+        ax.text(0.53,0.85,'Cuprates',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='gold')
+        ax.text(0.6,0.54,'Fullerenes',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='cyan')
+        ax.text(0.86,0.1,'Carbon-based',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='dimgray')
+        ax.text(0.88,0.7,'Iron-based',transform=ax.transAxes,
+                fontsize=12,va='center',ha='center',color='red')
+
+        ax.text(0.5,-0.1,'Discovery year',
+                transform=ax.transAxes,
+                fontsize=12,va='center',ha='center')
+        ax.text(-0.1,0.5,r'$T_C$ (K)',rotation=90,
+                transform=ax.transAxes,
+                fontsize=12,va='center',ha='center')
+
+        tex_labels.prepare(fig)
+        plot.savefig('sfluid2.png')
+        #plot.show()
+
+    # Third plot
+    def plot3(self):
+        ax=self.new_axes()
+        fig=self.fig
+
+
+        plot.xlim([1900,2040])
+        plot.ylim([2.0e-1,4.0e11])
+
+        for i in range(0,len(dat)):
+            if dat[i][3]==1:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='blue',mew=0)
+            elif dat[i][3]==2:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='salmon',mew=0)
+            elif dat[i][3]==3:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='gold',mew=0)
+            elif dat[i][3]==4:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='cyan',mew=0)
+            elif dat[i][3]==5:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='dimgray',mew=0)
+            elif dat[i][3]==6:
+                plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                              marker='o',mfc='red',mew=0)
+            elif dat[i][3]==7:
+                if i==len(dat)-1:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mec='blue',mew=1,mfc='none')
+                else:
+                    plot.semilogy(time(dat[i][1]),tptr(dat[i][2]),
+                                  marker='o',mfc='blue',mew=0)
+
+        x_scale=1.004
+        y_scale=1.0
+
+        plot.semilogy(2009,1.2e10,marker='o',mfc='green',mew=0)
+        ax.text(2009*x_scale,1.2e10*y_scale,r'$^{1}S_0$ n',
+                fontsize=12,va='center',ha='center')
+        plot.semilogy(2009,4.0e9,marker='o',mfc='green',mew=0)
+        ax.text(2009*x_scale,4.0e9*y_scale,r'$^{1}S_0$ p',
+                fontsize=12,va='center',ha='center')
+        plot.semilogy(2009,5.0e8,marker='o',mfc='green',mew=0)
+        ax.text(2009*x_scale,5.0e8*y_scale,r'$^{3}P_2$ n',
+                fontsize=12,va='center',ha='center')
+        plot.semilogy(1958,3.5e10,marker='o',mfc='green',mew=0)
+        ax.text(1960*x_scale,3.0e10*y_scale,r'(Z,N)',
+                fontsize=12,va='center',ha='center')
+        plot.semilogy(1977,1.6e10,marker='o',mec='purple',mfc='none',mew=1)
+        ax.text(1977*x_scale,1.6e10*y_scale,r'uds',
+                fontsize=12,va='center',ha='center')
+
+        ax.text(1965,7.5e10,'Bohr and Mottelson (1957)',
+                fontsize=12,va='center',ha='right')
+        ax.text(2007,7.0e9,'Brown and Cumming (2009)',
+                fontsize=12,va='center',ha='right')
+        ax.text(2007,3.4e10,'Barrois (1977)',
+                fontsize=12,va='center',ha='right')
+        ax.text(2010,1.3e9,'Page et al. (2009)',
+                fontsize=12,va='center',ha='right')
+
+        ax.text(0.5,-0.1,'Discovery year',
+                transform=ax.transAxes,
+                fontsize=12,va='center',ha='center')
+        ax.text(-0.1,0.5,r'$T_C$ (K)',rotation=90,
+                transform=ax.transAxes,
+                fontsize=12,va='center',ha='center')
+
+        tex_labels.prepare(fig)
+        plot.savefig('sfluid3.png')
+        #plot.show()
+
+    # Create all three plots
+    def run(self):
+        self.plot1()
+        self.plot2()
+        self.plot3()
+
+""" -------------------------------------------------------------------
+Create the plots
+"""
 
+if __name__=='__main__':
+    sp=sfluid_plot()
+    sp.run()
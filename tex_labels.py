@@ -0,0 +1,146 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Label handling shared by the plot scripts.
+
+With usetex, matplotlib's TexManager keeps the .dvi and .png output
+for each label in an on-disk cache. Its file names are hashes of the
+full TeX source, which includes the preamble and the font size, and
+the files are written atomically, so the cache is already persistent
+and safe to share between runs and between the worker processes of
+build.py. What costs time is filling it, since each new label runs
+latex and dvipng one after another. prepare() renders the missing
+labels of a figure in parallel before it is saved, skipping labels
+which are already in the cache and rendering a few missing labels in
+the calling process rather than starting a pool.
+
+Draft mode, selected by setting the environment variable NSTAR_DRAFT
+to a nonzero value, uses mathtext instead of usetex, which needs no
+external programs. Labels which mathtext cannot parse are shown as
+their TeX source.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Matplotlib settings which change the TeX source of a label
+tex_rc_keys=['font.family','font.serif','font.sans-serif','font.cursive',
+             'font.monospace','text.latex.preamble']
+
+# Largest number of missing labels which prepare() renders in the
+# calling process instead of in a process pool
+inline_max=4
+
+# Return True if draft mode was requested in the environment
+def draft_mode():
+    return os.environ.get('NSTAR_DRAFT','0') not in ['','0']
+
+"""
+Set the text rendering mode, replacing plot.rc('text',usetex=True)
+in the plot scripts, and return True if usetex is used. If
+cache_dir is given, the TeX cache is moved there.
+"""
+def setup(plot,draft=None,cache_dir=None):
+    if draft is None:
+        draft=draft_mode()
+    if draft:
+        plot.rc('text',usetex=False)
+        plot.rc('mathtext',fontset='cm')
+        return False
+    plot.rc('text',usetex=True)
+    if cache_dir is not None:
+        from matplotlib.texmanager import TexManager
+        os.makedirs(cache_dir,exist_ok=True)
+        if hasattr(TexManager,'_cache_dir'):
+            import pathlib
+            TexManager._cache_dir=pathlib.Path(cache_dir)
+        else:
+            TexManager.texcache=cache_dir
+    return True
+
+"""
+Render one label into the TeX cache, in a worker process using the
+matplotlib settings 'rc' from the parent
+"""
+def render_label(tex,fontsize,dpi,rc):
+    import matplotlib
+    from matplotlib.texmanager import TexManager
+    matplotlib.rcParams.update(rc)
+    TexManager().make_png(tex,fontsize,dpi)
+    return tex
+
+# Return True if the TeX cache has the rendered image of a label
+def is_cached(tex,fontsize,dpi):
+    from matplotlib.texmanager import TexManager
+    if hasattr(TexManager,'_get_base_path'):
+        path=TexManager._get_base_path(tex,fontsize,dpi)
+        return path.with_suffix('.png').exists()
+    return os.path.exists(TexManager().get_basefile(tex,fontsize,dpi)+
+                          '.png')
+
+# Return the unique (text,fontsize) pairs of the visible labels in fig
+def figure_labels(fig):
+    from matplotlib.text import Text
+    labels=set()
+    for t in fig.findobj(Text):
+        if t.get_visible() and t.get_text()!='':
+            labels.add((t.get_text(),t.get_fontsize()))
+    return sorted(labels)
+
+"""
+In draft mode, replace each label which mathtext cannot parse by its
+escaped TeX source. Otherwise render the labels of fig which are
+not yet in the TeX cache, so that savefig() finds them there: in
+this process if there are at most inline_max of them, and otherwise
+using n_jobs processes.
+"""
+def prepare(fig,dpi=None,n_jobs=None):
+    import matplotlib
+    if not matplotlib.rcParams['text.usetex']:
+        from matplotlib.text import Text
+        from matplotlib.mathtext import MathTextParser
+        parser=MathTextParser('path')
+        for t in fig.findobj(Text):
+            s=t.get_text()
+            if s.count('$')>=2:
+                try:
+                    parser.parse(s,72)
+                except ValueError:
+                    t.set_text(s.replace('$',r'\$'))
+        return
+    if dpi is None:
+        dpi=matplotlib.rcParams['savefig.dpi']
+        if dpi=='figure':
+            dpi=fig.dpi
+    labels=[(tex,fontsize) for (tex,fontsize) in figure_labels(fig)
+            if not is_cached(tex,fontsize,dpi)]
+    if len(labels)==0:
+        return
+    rc=dict((k,matplotlib.rcParams[k]) for k in tex_rc_keys)
+    if len(labels)<=inline_max or n_jobs==1:
+        for (tex,fontsize) in labels:
+            render_label(tex,fontsize,dpi,rc)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures=[pool.submit(render_label,tex,fontsize,dpi,rc)
+                 for (tex,fontsize) in labels]
+        for fut in futures:
+            fut.result()
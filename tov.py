@@ -0,0 +1,348 @@
+"""
+-------------------------------------------------------------------
+
+Copyright (C) 2016, Andrew W. Steiner
+
+This neutron star plot is free software; you can redistribute it
+and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3 of
+the License, or (at your option) any later version.
+
+This neutron star plot is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this neutron star plot. If not, see
+<http://www.gnu.org/licenses/>.
+
+-------------------------------------------------------------------
+
+Solve the TOV equations for an EOS in a full_eos table and write the
+mass-radius curve as an mvsr table for eos_mvsr.py.
+
+The equations are integrated in the pseudo-enthalpy h, where
+dh=dP/(e+P), following Lindblom (1992). Every star then runs from
+its central enthalpy h_c to h=0 at the surface, so a whole array of
+stars can be advanced together with a fixed number of fourth-order
+Runge-Kutta steps in t=sqrt(1-h/h_c), with no need to detect the
+surface of each star separately.
+
+Usage: python tov.py [eos file] [mvsr file]
+"""
+
+import sys
+import numpy
+from concurrent.futures import ProcessPoolExecutor
+import o2_io
+import bench
+
+""" -------------------------------------------------------------------
+Class definition
+"""
+class tov_solver:
+
+    # Number of uniform Runge-Kutta steps in t
+    n_steps=200
+    # Number of geometrically spaced steps between the start of the
+    # integration and t_mid, where the equations for y and w are
+    # stiff
+    n_center=24
+    t_mid=0.05
+    # Value of 1-h/h_c at which the series expansion near the center
+    # is matched to the integration
+    h_start=1.0e-6
+    # Number of points in the EOS tables, see grid_u()
+    n_grid=2000
+    # For each EOS, a dictionary of the original table, with the
+    # energy density and pressure in 1/km^2, and the baryon density
+    # in 1/fm^3 or None
+    tables=[]
+    # Maximum enthalpy of each EOS
+    h_max=0
+    # Enthalpy scale of the grid for each EOS, the enthalpy of the
+    # second point of the table
+    h_low=0
+    # Logarithms of the energy density and pressure, and de/dh, for
+    # each EOS (first index) on a grid uniform in grid_u()
+    grid_log_ed=0
+    grid_log_pr=0
+    grid_dedh=0
+
+    """
+    Read the EOS from table 'name' in fname. The energy density and
+    pressure are in 1/fm^4, as in the full_eos tables from O2scl.
+    """
+    def read_eos(self,fname='eos.o2',name='full_eos'):
+        dset=o2_io.h5read_type_named(fname,'table',name)
+        cols=['ed','pr']
+        if 'nb' in dset['data']:
+            cols.append('nb')
+        eos=o2_io.read_columns(dset,cols)
+        self.set_eos(eos['ed'],eos['pr'],eos.get('nb'))
+
+    """
+    Set the EOS from arrays of the energy density and pressure in
+    1/fm^4 and optionally the baryon density in 1/fm^3
+    """
+    def set_eos(self,ed,pr,nb=None):
+        self.set_eos_list([(ed,pr,nb)])
+
+    """
+    Set several EOSs at once from a list of (ed,pr,nb) tuples, as in
+    set_eos(), so that stars from all of them can be integrated in
+    one call to integrate()
+    """
+    def set_eos_list(self,eos_list):
+        fact=o2_io.unit_factor('1/fm^4','1/km^2')
+        self.tables=[]
+        n=len(eos_list)
+        self.h_max=numpy.zeros(n)
+        self.h_low=numpy.zeros(n)
+        self.grid_log_ed=numpy.zeros((n,self.n_grid))
+        self.grid_log_pr=numpy.zeros((n,self.n_grid))
+        self.grid_dedh=numpy.zeros((n,self.n_grid))
+        u=numpy.linspace(0.0,1.0,self.n_grid)
+        for (i,(ed,pr,nb)) in enumerate(eos_list):
+            # Keep the points with increasing pressure
+            order=numpy.argsort(pr)
+            ed=numpy.asarray(ed)[order]*fact
+            pr=numpy.asarray(pr)[order]*fact
+            keep=numpy.concatenate(([True],numpy.diff(pr)>0))
+            keep&=(pr>0)
+            tab={'ed':ed[keep],'pr':pr[keep],'nb':None}
+            if nb is not None:
+                tab['nb']=numpy.asarray(nb)[order][keep]
+            # h=int dP/(e+P), zero at the lowest pressure in the table
+            tab['h']=numpy.concatenate(([0.0],numpy.cumsum(
+                numpy.diff(tab['pr'])*2.0/(tab['ed'][1:]+tab['pr'][1:]+
+                                           tab['ed'][:-1]+
+                                           tab['pr'][:-1]))))
+            self.tables.append(tab)
+            self.h_max[i]=tab['h'][-1]
+            self.h_low[i]=tab['h'][1]
+            h=self.grid_h(u,i)
+            ed_h=numpy.exp(numpy.interp(h,tab['h'],numpy.log(tab['ed'])))
+            self.grid_log_ed[i]=numpy.log(ed_h)
+            self.grid_log_pr[i]=numpy.interp(h,tab['h'],
+                                             numpy.log(tab['pr']))
+            self.grid_dedh[i]=numpy.gradient(ed_h,h)
+
+    """
+    Return the position from 0 to 1 in the EOS grid of enthalpy h
+    for the EOS indices ieos. The grid is uniform in
+    log(1+sqrt(h/h_low)), which is uniform in sqrt(h) near the
+    surface, as suits the e ~ h^n of a polytrope there, and uniform
+    in log(h) above h_low, so that stars with a central enthalpy far
+    below h_max still have many grid points.
+    """
+    def grid_u(self,h,ieos):
+        s=numpy.sqrt(numpy.maximum(h,0.0)/self.h_low[ieos])
+        return (numpy.log1p(s)/
+                numpy.log1p(numpy.sqrt(self.h_max[ieos]/self.h_low[ieos])))
+
+    # The enthalpy at position u in the EOS grid, the inverse of grid_u()
+    def grid_h(self,u,ieos):
+        s=numpy.expm1(u*numpy.log1p(numpy.sqrt(self.h_max[ieos]/
+                                               self.h_low[ieos])))
+        return self.h_low[ieos]*s**2
+
+    """
+    Return the energy density, pressure and de/dh at enthalpy h for
+    the stars with EOS indices ieos, interpolating linearly in the
+    grid for each EOS
+    """
+    def eos_h(self,h,ieos):
+        x=self.grid_u(h,ieos)*(self.n_grid-1)
+        j=numpy.clip(x.astype(int),0,self.n_grid-2)
+        w=numpy.clip(x-j,0.0,1.0)
+        def lookup(grid):
+            return grid[ieos,j]*(1.0-w)+grid[ieos,j+1]*w
+        return (numpy.exp(lookup(self.grid_log_ed)),
+                numpy.exp(lookup(self.grid_log_pr)),
+                lookup(self.grid_dedh))
+
+    """
+    Right-hand side of the TOV equations in t, where h=h_c(1-t^2).
+    With this variable r is close to linear in t near the center.
+    Along with r and m, this integrates y=r H'/H for the tidal Love
+    number (Hinderer 2008) and w=r w'/w for the frame dragging
+    frequency w, which gives the moment of inertia.
+    """
+    def derivs(self,t,h_c,ieos,r,m,y,w):
+        (ed,pr,dedh)=self.eos_h(h_c*(1.0-t**2),ieos)
+        fourpi=4.0*numpy.pi
+        elam=1.0/(1.0-2.0*m/r)
+        drdt=2.0*h_c*t*r*(r-2.0*m)/(m+fourpi*r**3*pr)
+        dmdt=fourpi*r**2*ed*drdt
+        q=(fourpi*elam*(5.0*ed+9.0*pr+dedh)-6.0*elam/r**2-
+           (2.0*(m+fourpi*r**3*pr)*elam/r**2)**2)
+        dydt=-(y**2+y*elam*(1.0+fourpi*r**2*(pr-ed))+r**2*q)/r*drdt
+        dwdt=(-w*(w+3.0)/r+fourpi*r*(ed+pr)*(w+4.0)*elam)*drdt
+        return (drdt,dmdt,dydt,dwdt)
+
+    # The values of t at the Runge-Kutta steps
+    def t_grid(self):
+        return numpy.concatenate((numpy.geomspace(
+            numpy.sqrt(self.h_start),self.t_mid,self.n_center+1)[:-1],
+                                  numpy.linspace(self.t_mid,1.0,
+                                                 self.n_steps+1)))
+
+    """
+    Integrate the stars with central energy densities ed_c (in
+    1/fm^4) and EOS indices ieos (all zero if None) together.
+    Returns a dictionary of arrays with the radius 'r' in km, the
+    gravitational mass 'gm' in solar masses, the Love number 'k2',
+    the tidal deformability 'lambda' in g cm^2 s^2 and the moment of
+    inertia 'I' in Msun km^2.
+    """
+    def integrate(self,ed_c,ieos=None):
+        fact=o2_io.unit_factor('1/fm^4','1/km^2')
+        ed_c=numpy.asarray(ed_c,dtype=float)*fact
+        if ieos is None:
+            ieos=numpy.zeros(len(ed_c),dtype=int)
+        h_c=numpy.zeros(len(ed_c))
+        for i in numpy.unique(ieos):
+            sel=(ieos==i)
+            h_c[sel]=numpy.interp(numpy.log(ed_c[sel]),
+                                  self.grid_log_ed[i],
+                                  numpy.linspace(0.0,1.0,self.n_grid))
+        h_c=self.grid_h(h_c,ieos)
+        (e0,p0,dedh0)=self.eos_h(h_c,ieos)
+        # Series expansion near the center
+        t_all=self.t_grid()
+        r=numpy.sqrt(3.0*h_c*self.h_start/(2.0*numpy.pi*(e0+3.0*p0)))
+        m=4.0/3.0*numpy.pi*e0*r**3
+        y=numpy.full(len(ed_c),2.0)
+        w=numpy.zeros(len(ed_c))
+        state=(r,m,y,w)
+        for (t,dt) in zip(t_all[:-1],numpy.diff(t_all)):
+            k1=self.derivs(t,h_c,ieos,*state)
+            k2=self.derivs(t+dt/2.0,h_c,ieos,
+                           *[x+dt/2.0*k for (x,k) in zip(state,k1)])
+            k3=self.derivs(t+dt/2.0,h_c,ieos,
+                           *[x+dt/2.0*k for (x,k) in zip(state,k2)])
+            k4=self.derivs(t+dt,h_c,ieos,
+                           *[x+dt*k for (x,k) in zip(state,k3)])
+            state=tuple(x+dt/6.0*(a+2.0*b+2.0*c+d) for
+                        (x,a,b,c,d) in zip(state,k1,k2,k3,k4))
+        (r,m,y,w)=state
+        msun=o2_io.unit_factor('Msun','km')
+        # Love number from y and the compactness at the surface
+        c=m/r
+        k2=(1.6*c**5*(1.0-2.0*c)**2*(2.0+2.0*c*(y-1.0)-y)/
+            (2.0*c*(6.0-3.0*y+3.0*c*(5.0*y-8.0))+
+             4.0*c**3*(13.0-11.0*y+c*(3.0*y-2.0)+2.0*c**2*(1.0+y))+
+             3.0*(1.0-2.0*c)**2*(2.0-y+2.0*c*(y-1.0))*
+             numpy.log(1.0-2.0*c)))
+        # lambda=2 k2 R^5/(3 G) in cgs units
+        lam=2.0/3.0*k2*(r*1.0e5)**5/6.674e-8
+        return {'r':r,'gm':m/msun,'k2':k2,'lambda':lam,
+                'I':w*r**3/(6.0+2.0*w)/msun}
+
+    """
+    Integrate the stars with central energy densities ed_c (in
+    1/fm^4) together and return their radii in km and gravitational
+    masses in solar masses
+    """
+    def solve(self,ed_c):
+        res=self.integrate(ed_c)
+        return (res['r'],res['gm'])
+
+    """
+    Solve for the stars in ed_c, split into n_jobs chunks which are
+    integrated in a process pool
+    """
+    def solve_pool(self,ed_c,n_jobs=4):
+        chunks=numpy.array_split(numpy.asarray(ed_c,dtype=float),n_jobs)
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            res=list(pool.map(self.solve,chunks))
+        return (numpy.concatenate([x[0] for x in res]),
+                numpy.concatenate([x[1] for x in res]))
+
+    """
+    Default central energy densities in 1/fm^4, n_stars points
+    spaced logarithmically from ed_min to the end of the table for
+    EOS ieos
+    """
+    def central_densities(self,n_stars=200,ed_min=1.0,ieos=0):
+        fact=o2_io.unit_factor('1/fm^4','1/km^2')
+        ed_max=self.tables[ieos]['ed'][-1]/fact
+        return numpy.logspace(numpy.log10(ed_min),numpy.log10(ed_max),
+                              n_stars)
+
+    """
+    Compute the M-R curve for the central energy densities ed_c
+    (the defaults from central_densities() if None) and write it to
+    table 'name' in fname, with columns r (km), gm (Msun), and the
+    central ed and pr (1/fm^4) and nb (1/fm^3) when the EOS has it
+    """
+    def write_mvsr(self,fname='mvsr.o2',name='mvsr',ed_c=None,
+                   n_jobs=None):
+        if ed_c is None:
+            ed_c=self.central_densities()
+        ed_c=numpy.asarray(ed_c,dtype=float)
+        if n_jobs is None or n_jobs<=1:
+            (r,gm)=self.solve(ed_c)
+        else:
+            (r,gm)=self.solve_pool(ed_c,n_jobs)
+        fact=o2_io.unit_factor('1/fm^4','1/km^2')
+        tab=self.tables[0]
+        log_ed_c=numpy.log(ed_c*fact)
+        log_ed=numpy.log(tab['ed'])
+        pr_c=numpy.exp(numpy.interp(log_ed_c,log_ed,numpy.log(tab['pr'])))
+        cols=[('r',r),('gm',gm),('ed',ed_c),('pr',pr_c/fact)]
+        units={'r':'km','gm':'Msun','ed':'1/fm^4','pr':'1/fm^4'}
+        if tab['nb'] is not None:
+            cols.append(('nb',numpy.interp(log_ed_c,log_ed,tab['nb'])))
+            units['nb']='1/fm^3'
+        o2_io.write_table(fname,name,cols,units)
+
+    """
+    Check the radii of stars with the polytrope P=K e^2 against the
+    Newtonian radius sqrt(pi K/2), with e and P in 1/km^2, which the
+    stars approach at low central densities. The table extends to
+    ed_min so that it covers the outer layers of the stars, and
+    relativistic corrections, which are about 2M/R, are below 0.2
+    percent for central energy densities up to 1e-3 1/fm^4.
+    Returns the relative errors and raises an exception if any is
+    larger than tol.
+    """
+    def check_polytrope(self,K=0.3,ed_c=(1.0e-5,1.0e-4,1.0e-3),
+                        ed_min=1.0e-12,tol=2.0e-3):
+        fact=o2_io.unit_factor('1/fm^4','1/km^2')
+        ed=numpy.logspace(numpy.log10(ed_min),1,1000)
+        self.set_eos(ed,K*ed**2)
+        r=self.solve(numpy.array(ed_c,dtype=float))[0]
+        err=r/numpy.sqrt(numpy.pi*K/fact/2.0)-1.0
+        if numpy.max(numpy.abs(err))>tol:
+            raise RuntimeError('Polytrope radii '+str(r)+
+                               ' differ from the analytic radius.')
+        return err
+
+    """
+    Print the throughput of solve() and solve_pool() in stars per
+    second for each number of stars in 'sizes', using a polytrope if
+    no EOS has been read
+    """
+    def bench_solve(self,sizes=(10,100,1000,10000),n_jobs=4):
+        if len(self.tables)==0:
+            ed=numpy.logspace(-4,1,1000)
+            self.set_eos(ed,0.3*ed**2)
+        for n in sizes:
+            ed_c=self.central_densities(n)
+            t_serial=bench.timed(self.solve,ed_c)[1]
+            t_pool=bench.timed(self.solve_pool,ed_c,n_jobs)[1]
+            bench.report(str(n).rjust(6)+' stars:',
+                         [('serial',t_serial),
+                          (str(n_jobs)+' jobs',t_pool)],4)
+
+""" -------------------------------------------------------------------
+Compute the M-R curve
+"""
+
+if __name__=='__main__':
+    ts=tov_solver()
+    ts.read_eos(*sys.argv[1:2])
+    ts.write_mvsr(*sys.argv[2:3])